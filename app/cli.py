@@ -0,0 +1,205 @@
+"""Generate rules or extract tables for a directory tree of workbooks, without the HTTP service.
+
+Run from the repository root:
+
+    python -m app.cli rules INPUT OUTPUT_DIR --workers 8
+    python -m app.cli extract INPUT OUTPUT_DIR --start-sheet End_Connection --end-sheet Optional_Features
+
+INPUT is a directory tree of workbooks or a single workbook. Results are
+written straight into OUTPUT_DIR, mirroring the input tree:
+{dir}/{workbook}_rules.txt for rules and {dir}/{workbook}/{sheet}_{n}.{format}
+for tables (--flat writes the tables of a single workbook into OUTPUT_DIR
+itself, as app/initial/extractTables.py did). Finished workbooks are logged in OUTPUT_DIR/progress.jsonl, so
+rerunning the same command after an interruption skips them; workbooks that
+failed or changed since are run again.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from .utils.batchExtract import EXTRACT_WORKERS, extract_batch_item
+from .utils.extractTables import TABLE_DETECTORS
+from .utils.generateRules import PREFIX, compact_rules, encode_rules
+from .utils.metrics import StageTimer, replay, timing
+from .utils.processPools import process_pool
+from .utils.progressJournal import JOURNAL_NAME, ProgressJournal, file_signature
+from .utils.ruleRunner import generate_rules_for_workbooks
+from .utils.sheetReaders import READERS, SHEET_READER, available_readers, reader_available
+from .utils.tableFormats import OUTPUT_FORMATS, available_formats, format_available
+from .utils.uploads import WORKBOOK_EXTENSIONS
+
+def find_workbooks(input_dir, skip_dir=None):
+    """Paths of the workbooks under input_dir relative to it, in a stable order"""
+    skip_dir = os.path.abspath(skip_dir) if skip_dir else None
+    workbooks = []
+    for root, dirs, files in os.walk(input_dir):
+        # The output tree may live inside the input tree
+        dirs[:] = sorted(d for d in dirs if os.path.abspath(os.path.join(root, d)) != skip_dir)
+        for name in sorted(files):
+            if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith("~$"):
+                workbooks.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return workbooks
+
+def write_file(path, data):
+    """Write through a temp file, so an interrupted run never leaves a partial output"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def pending_workbooks(args, journal):
+    """[(workbook, signature)] still to run, skipping the ones the journal has as done"""
+    workbooks = args.workbooks or find_workbooks(args.input_dir, args.output_dir)
+    pending = []
+    for workbook in workbooks:
+        signature = file_signature(os.path.join(args.input_dir, workbook))
+        if not journal.is_done(workbook, signature):
+            pending.append((workbook, signature))
+    print(f"📂 {len(workbooks)} workbooks, {len(workbooks) - len(pending)} already done, {len(pending)} to run")
+    return pending
+
+def run_rules(args, journal, pending, totals):
+    excel_paths = [os.path.join(args.input_dir, workbook) for workbook, _ in pending]
+    results = generate_rules_for_workbooks(excel_paths, args.workers, args.header_scan_limit, None, args.reader)
+    for (workbook, signature), (_, rules) in zip(pending, results):
+        if rules is None:
+            journal.record(workbook, signature, error="Could not open workbook")
+            totals["failed"] += 1
+            continue
+        if args.compact:
+            rules, _ = compact_rules(rules)
+        output = None
+        if rules:
+            output = f"{os.path.splitext(workbook)[0]}_rules.txt"
+            write_file(os.path.join(args.output_dir, output), encode_rules(rules))
+            print(f"💾 {output}: {len(rules)} rules")
+        else:
+            print(f"❌ No rules generated for {workbook}")
+        journal.record(workbook, signature, output=output, rules=len(rules))
+        totals["done"] += 1
+
+def run_extract(args, journal, pending, totals):
+    def item_args(workbook):
+        return (
+            os.path.join(args.input_dir, workbook),
+            args.output_dir if args.flat else os.path.join(args.output_dir, os.path.splitext(workbook)[0]),
+            args.start_sheet, args.end_sheet, args.streaming, args.detect, args.output_format,
+        )
+
+    def finish(workbook, signature, written, error, events):
+        # Stages and counters of the worker are recorded here, under the run's timer
+        replay(events)
+        if error:
+            print(f"❌ {workbook}: {error}")
+            totals["failed"] += 1
+        else:
+            print(f"📦 {workbook}: {len(written)} tables")
+            totals["done"] += 1
+        journal.record(workbook, signature, error=error, tables=len(written))
+
+    workers = min(args.workers or EXTRACT_WORKERS, len(pending)) or 1
+    if workers <= 1:
+        for workbook, signature in pending:
+            finish(workbook, signature, *extract_batch_item(*item_args(workbook)))
+        return
+
+    with process_pool(workers) as pool:
+        futures = {
+            pool.submit(extract_batch_item, *item_args(workbook)): (workbook, signature)
+            for workbook, signature in pending
+        }
+        try:
+            # Journal workbooks as they finish, not in order, so a slow one doesn't hold back the others
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    result = [], f"Worker process died: {e}", []
+                finish(*futures[future], *result)
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+def settings(args):
+    """Options that change the output; journal entries written with others don't count as done"""
+    if args.command == "rules":
+        return {
+            "command": "rules", "prefix": PREFIX, "header_scan_limit": args.header_scan_limit,
+            "reader": args.reader or SHEET_READER, "compact": args.compact,
+        }
+    return {
+        "command": "extract", "start_sheet": args.start_sheet, "end_sheet": args.end_sheet,
+        "detect": args.detect, "output_format": args.output_format, "flat": args.flat,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command):
+        command.add_argument("input", help="Directory tree of Excel files, or one Excel file")
+        command.add_argument("output_dir", help="Where results are written, mirroring the input tree")
+        command.add_argument("--workers", type=int, help="Worker processes")
+        command.add_argument("--journal", help=f"Progress journal, defaults to OUTPUT_DIR/{JOURNAL_NAME}")
+        command.add_argument("--restart", action="store_true", help="Ignore the journal and run every workbook")
+
+    rules = commands.add_parser("rules", help="Write a rule file per workbook (RULE_WORKERS workers by default)")
+    add_common(rules)
+    rules.add_argument("--header-scan-limit", type=int, help="Only look for the header in the first N rows")
+    rules.add_argument("--reader", choices=list(READERS), help="Sheet reader, defaults to SHEET_READER")
+    rules.add_argument("--compact", action="store_true", help="Merge rules that exclude the same keys and drop duplicates")
+
+    extract = commands.add_parser("extract", help="Write every table of a sheet range per workbook (EXTRACT_WORKERS workers by default)")
+    add_common(extract)
+    extract.add_argument("--start-sheet", required=True)
+    extract.add_argument("--end-sheet", required=True)
+    extract.add_argument("--streaming", action="store_true", help="Read only the requested sheets, row by row")
+    extract.add_argument("--detect", choices=TABLE_DETECTORS, default="rows", help="Table detection")
+    extract.add_argument("--output-format", choices=list(OUTPUT_FORMATS), default="xlsx", help="Table file format")
+    extract.add_argument("--flat", action="store_true", help="Write the tables straight into OUTPUT_DIR (INPUT must be one workbook)")
+
+    args = parser.parse_args(argv)
+    if os.path.isdir(args.input):
+        args.input_dir, args.workbooks = args.input, None
+    elif os.path.isfile(args.input):
+        args.input_dir, args.workbooks = os.path.dirname(args.input) or ".", [os.path.basename(args.input)]
+    else:
+        parser.error(f"File or directory not found: {args.input}")
+    if args.command == "rules" and args.header_scan_limit is not None and args.header_scan_limit < 1:
+        parser.error("--header-scan-limit must be at least 1")
+    if args.command == "rules" and args.reader and not reader_available(args.reader):
+        parser.error(f"Reader not installed: {args.reader}, available: {', '.join(available_readers())}")
+    if args.command == "extract" and args.flat and args.workbooks is None:
+        parser.error("--flat needs a single workbook as INPUT")
+    if args.command == "extract" and not format_available(args.output_format):
+        parser.error(f"Output format not installed: {args.output_format}, available: {', '.join(available_formats())}")
+    return args
+
+def main(argv=None):
+    """Run the command, returns the exit code: 0 if every workbook succeeded, 1 if any failed, 130 if interrupted"""
+    args = parse_args(argv)
+    journal_path = args.journal or os.path.join(args.output_dir, JOURNAL_NAME)
+    totals = {"done": 0, "failed": 0}
+    start = time.perf_counter()
+
+    with ProgressJournal(journal_path, settings(args), args.restart) as journal, timing(StageTimer()) as timer:
+        pending = pending_workbooks(args, journal)
+        try:
+            if args.command == "rules":
+                run_rules(args, journal, pending, totals)
+            else:
+                run_extract(args, journal, pending, totals)
+        except KeyboardInterrupt:
+            print(f"\n⏸️ Interrupted after {totals['done'] + totals['failed']} workbooks, run the same command again to resume")
+            return 130
+
+    timer.print_slowest()
+    print(f"✅ {totals['done']} done, {totals['failed']} failed in {time.perf_counter() - start:.1f}s, journal: {journal_path}")
+    return 1 if totals["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,96 +1,34 @@
+# The original one-off table script, now a preset for the batch runner in app/cli.py:
+#
+#   python app/initial/extractTables.py <excel_path> [output_dir] [--start-sheet ...] [--end-sheet ...]
+#
+# runs python -m app.cli extract <excel_path> <output_dir> ... --detect rows --flat. The tables
+# are found the way the script did, by full-width rows, and written as output_dir/{sheet}_{n}.xlsx
+# as before, next to the runner's progress.jsonl.
+import argparse
 import os
-from copy import copy
-from openpyxl import load_workbook, Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border
+import sys
 
-# === CONFIGURATION ===
-excel_path = r"C:\Users\anand.kumar\Documents\ruleset\KEY-GR_PM.xlsx"
-output_dir = "extracted_tables_with_formatting"
-os.makedirs(output_dir, exist_ok=True)
+# Run as a file, so the repository root isn't on the path yet
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from app.cli import main
 
-wb = load_workbook(excel_path)
-all_sheets = wb.sheetnames
+# === DEFAULTS ===
+output_dir = "extracted_tables_with_formatting"
 start_sheet = "End_Connection"
 end_sheet = "Optional_Features"
 
-start_index = all_sheets.index(start_sheet)
-end_index = all_sheets.index(end_sheet)
-sheets_to_extract = all_sheets[start_index:end_index + 1]
-
-def is_colored(cell):
-    fill = cell.fill
-    return (
-        fill
-        and fill.fgColor
-        and fill.fgColor.type == 'rgb'
-        and fill.fgColor.rgb not in ['00000000', 'FFFFFFFF']
-    )
-
-def is_data_row(row):
-    return sum(1 for cell in row if cell.value not in (None, "")) >= 2
-
-def copy_cell_format(source_cell, target_cell):
-    target_cell.value = source_cell.value
-    if source_cell.has_style:
-        target_cell.fill = copy(source_cell.fill)
-        target_cell.font = copy(source_cell.font)
-        target_cell.border = copy(source_cell.border)
-        target_cell.alignment = copy(source_cell.alignment)
-        target_cell.number_format = source_cell.number_format
-
-def extract_tables_from_sheet(ws, sheet_name):
-    rows = list(ws.iter_rows())
-    table_blocks = []
-    current_block = []
-    block_start_indices = []
-    inside_block = False
-
-    for i, row in enumerate(rows):
-        row_is_colored = any(is_colored(cell) for cell in row)
-        row_is_data = is_data_row(row)
-
-        if row_is_colored or row_is_data:
-            if not inside_block:
-                block_start_indices.append(i)
-                inside_block = True
-            current_block.append(row)  # Keep cell objects
-        else:
-            if inside_block:
-                table_blocks.append((block_start_indices[-1], current_block))
-                current_block = []
-                inside_block = False
-
-    if inside_block and current_block:
-        table_blocks.append((block_start_indices[-1], current_block))
-
-    # Write each table block to new Excel file with formatting
-    for idx, (start_row_idx, body_block) in enumerate(table_blocks):
-        header_block = []
-
-        for j in range(start_row_idx - 1, -1, -1):
-            values = [cell.value for cell in rows[j]]
-            if any(values):
-                header_block.insert(0, rows[j])  # Keep cell objects
-            else:
-                break
-
-        full_block = header_block + body_block
-        if full_block:
-            new_wb = Workbook()
-            new_ws = new_wb.active
-
-            for r_idx, row in enumerate(full_block, start=1):
-                for c_idx, cell in enumerate(row, start=1):
-                    copy_cell_format(cell, new_ws.cell(row=r_idx, column=c_idx))
-
-            filename = f"{sheet_name}_{idx + 1}.xlsx"
-            save_path = os.path.join(output_dir, filename)
-            new_wb.save(save_path)
-            print(f"✅ Saved: {filename}")
-
-# 🔁 Run for selected sheets
-for sheet_name in sheets_to_extract:
-    print(f"Processing sheet: {sheet_name}")
-    extract_tables_from_sheet(wb[sheet_name], sheet_name)
-
-print("🎉 Done. All tables saved with formatting.") 
\ No newline at end of file
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Extract the formatted tables of a sheet range of one workbook")
+    parser.add_argument("excel_path")
+    parser.add_argument("output_dir", nargs="?", default=output_dir)
+    parser.add_argument("--start-sheet", default=start_sheet)
+    parser.add_argument("--end-sheet", default=end_sheet)
+    args = parser.parse_args(argv)
+    return main([
+        "extract", args.excel_path, args.output_dir, "--start-sheet", args.start_sheet,
+        "--end-sheet", args.end_sheet, "--detect", "rows", "--flat",
+    ])
+
+if __name__ == "__main__":
+    sys.exit(run())
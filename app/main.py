@@ -1,133 +1,597 @@
 import os
-import uuid
+import queue
+import time
 import zipfile
-from fastapi import FastAPI, Query
-from fastapi.responses import FileResponse
-import pandas as pd
-import shutil
-from .utils.extractTables import extract_tables_with_formatting
-from .utils.generateRules import find_header_row, generate_rules_from_sheet, clean_dataframe
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import Body, FastAPI, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartException
+from .utils.batchExtract import iter_batch_entries
+from .utils.constraintIndex import ConstraintIndexes, directory_fingerprint
+from .utils.extractTables import TABLE_DETECTORS, iter_table_files, style_cache_stats
+from .utils.generateRules import PREFIX, compact_rules, compaction_stats, decode_rules, encode_rules
+from .utils.incrementalRules import incremental_rule_results, manifest_path
+from .utils.jobs import JobManager
+from .utils.lazyImports import warm_up
+from .utils.metrics import StageTimer, render_metrics, timing
+from .utils.resultCache import ResultCache, file_digest, iter_file
+from .utils.ruleRunner import generate_sheet_rules_for_workbooks
+from .utils.sheetReaders import READERS, SHEET_READER, available_readers, reader_available
+from .utils.tableFormats import OUTPUT_FORMATS, available_formats, format_available
+from .utils.uploads import WORKBOOK_EXTENSIONS, UploadSpool, multipart_available, source_name, source_size
+from .utils.zipStream import iter_zip, peek, spool, spool_zip, write_zip
 
-app = FastAPI()
+# Configuration
+WARM_UP = os.getenv("WARM_UP", "0") != "0"  # load pandas, numpy and openpyxl at startup instead of on first use
+
+def warm_up_app():
+    """Load what the first workbook request would, so it is served at full speed"""
+    start = time.perf_counter()
+    modules = warm_up()
+    print(f"🔥 Loaded {', '.join(modules)} in {time.perf_counter() - start:.2f}s")
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARM_UP:
+        warm_up_app()
+    # Expire jobs left in JOB_FOLDER by earlier runs
+    jobs.sweep()
+    yield
+
+app = FastAPI(lifespan=lifespan)
+jobs = JobManager()
+result_cache = ResultCache()
+constraint_indexes = ConstraintIndexes()
+
+def _then(chunks, callback):
+    """Pass chunks through and call callback once they are exhausted"""
+    yield from chunks
+    callback()
+
+def extract_zip_chunks(excel_path, start_sheet, end_sheet, streaming, use_cache=True, progress=None, detect="rows", output_format="xlsx"):
+    """Zip chunks for /extract plus the response headers, complete once the chunks are.
+
+    Results are cached by workbook content, sheet range, detector and output
+    format; a hit is served from the cache without opening the workbook.
+    """
+    headers = {}
+    # Hashing the workbook is only worth it if the result can be cached
+    use_cache = use_cache and result_cache.enabled
+    if use_cache:
+        key = result_cache.key("extract", file_digest(excel_path), start_sheet, end_sheet, detect, output_format)
+        cached = result_cache.open(key)
+        if cached is not None:
+            data, meta = cached
+            headers.update(meta.get("headers", {}))
+            print(f"♻️ Serving cached tables for {source_name(excel_path)}")
+            if progress:
+                progress(files_total=1)
+                progress(file=source_name(excel_path))
+            return iter_file(data), headers
+
+    style_caches = []
+    entries = iter_table_files(excel_path, start_sheet, end_sheet, streaming, progress, style_caches, detect, output_format)
+
+    def finish():
+        # Values-only formats copy no styles
+        if output_format == "xlsx":
+            style_stats = style_cache_stats(style_caches)
+            headers["X-Style-Cache-Hit-Rate"] = f"{style_stats['hit_rate']:.4f}"
+
+    chunks = _then(iter_zip(peek(entries) or []), finish)
+    if use_cache:
+        chunks = result_cache.store_stream(key, chunks, lambda: {"headers": dict(headers)})
+    return chunks, headers
+
+def zip_download(chunks, filename):
+    """Stream zip chunks straight to the client"""
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return StreamingResponse(chunks, media_type="application/zip", headers=headers)
+
+def zip_response(zip_file, filename, headers=None):
+    """Send a zip built in full by spool/spool_zip, for responses whose headers need the final counts"""
+    headers = dict(headers or {})
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    headers["Content-Length"] = str(zip_file.seek(0, os.SEEK_END))
+    zip_file.seek(0)
+    return StreamingResponse(iter_file(zip_file), media_type="application/zip", headers=headers)
+
+def timing_headers(timer):
+    """Per-request stage totals as a Server-Timing header, empty if nothing was timed"""
+    timer.print_slowest()
+    server_timing = timer.server_timing()
+    return {"Server-Timing": server_timing} if server_timing else {}
+
+def detect_error(detect):
+    """Error for an unknown table detector, None if it can be used"""
+    if detect in TABLE_DETECTORS:
+        return None
+    return {"error": f"❌ Unknown table detection: {detect}, choose from {', '.join(TABLE_DETECTORS)}"}
+
+def format_error(output_format):
+    """Error for an output format that doesn't exist or isn't installed, None if it can be used"""
+    if format_available(output_format):
+        return None
+    if output_format not in OUTPUT_FORMATS:
+        return {"error": f"❌ Unknown output format: {output_format}, choose from {', '.join(OUTPUT_FORMATS)}"}
+    return {"error": f"❌ Output format not installed: {output_format}, available: {', '.join(available_formats())}"}
+
+async def receive_uploads(request, spool, filename=None, archives=False):
+    """Workbooks sent with a request, as WorkbookBuffers or paths spilled by spool.
+
+    A multipart request may carry several files, each read in place from the
+    form parser's spooled file (an UploadedWorkbook held open by spool, which
+    also bounds how much of them stays in memory); any
+    other body is one file named by filename. With archives=True a .zip is replaced by the workbooks
+    inside it. Returns (sources, None) or (None, error).
+    """
+    received = []
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        if not multipart_available():
+            return None, {"error": "❌ Multipart uploads need python-multipart, send the file as the request body with &filename= instead"}
+        try:
+            form = await spool.receive_form(request)
+        except MultiPartException as e:
+            return None, {"error": f"❌ {e.message}"}
+        for _, value in form.multi_items():
+            if not isinstance(value, str):
+                received.append(spool.hold(value))
+    else:
+        if not filename:
+            return None, {"error": "❌ Name the uploaded file with &filename="}
+        received.append(await spool.receive(filename, request.stream()))
+
+    sources = []
+    for source in received:
+        name = source_name(source)
+        if source_size(source) == 0:
+            return None, {"error": f"❌ Empty upload: {name}"}
+        if archives and name.lower().endswith(".zip"):
+            try:
+                sources.extend(await run_in_threadpool(spool.expand, source))
+            except zipfile.BadZipFile:
+                return None, {"error": f"❌ Not a zip archive: {name}"}
+        elif name.lower().endswith(WORKBOOK_EXTENSIONS):
+            sources.append(source)
+        else:
+            return None, {"error": f"❌ Not an Excel workbook: {name}"}
+    if not sources:
+        return None, {"error": "❌ No workbooks uploaded"}
+    return sources, None
+
+def close_after(response, spool):
+    """Remove the spilled uploads of a request once its response has been sent"""
+    if isinstance(response, Response):
+        response.background = BackgroundTask(spool.close)
+    else:
+        spool.close()
+    return response
+
+def extract_download(excel_path, start_sheet, end_sheet, streaming, stream, cache, detect, output_format):
+    """Zip response with the tables of one workbook, from a path or an uploaded buffer"""
+    if stream:
+        chunks, _ = extract_zip_chunks(excel_path, start_sheet, end_sheet, streaming, cache, detect=detect, output_format=output_format)
+        return zip_download(chunks, "extracted_tables.zip")
+
+    with timing(StageTimer()) as timer:
+        chunks, headers = extract_zip_chunks(excel_path, start_sheet, end_sheet, streaming, cache, detect=detect, output_format=output_format)
+        zip_file = spool(chunks)
+    headers.update(timing_headers(timer))
+    return zip_response(zip_file, "extracted_tables.zip", headers=headers)
 
 @app.get("/extract")
 def extract_from_path(
     excel_path: str = Query(..., description="Full path to Excel file"),
     start_sheet: str = Query(...),
-    end_sheet: str = Query(...)
+    end_sheet: str = Query(...),
+    streaming: bool = Query(False, description="Read only the requested sheets, row by row"),
+    stream: bool = Query(False, description="Stream the zip as tables are produced (no X-Style-Cache-Hit-Rate)"),
+    cache: bool = Query(True, description="Use the result cache"),
+    detect: str = Query("rows", description="Table detection: rows (full-width rows) or regions (2D table boxes)"),
+    output_format: str = Query("xlsx", description="Table files as xlsx (formatted), csv, ndjson or parquet (values only)")
 ):
     if not os.path.exists(excel_path):
         return {"error": f"❌ File not found: {excel_path}"}
+    error = detect_error(detect) or format_error(output_format)
+    if error:
+        return error
+    return extract_download(excel_path, start_sheet, end_sheet, streaming, stream, cache, detect, output_format)
 
-    session_id = uuid.uuid4().hex
-    output_dir = f"output_{session_id}"
-    os.makedirs(output_dir, exist_ok=True)
+@app.post("/extract/upload")
+async def extract_upload(
+    request: Request,
+    start_sheet: str = Query(...),
+    end_sheet: str = Query(...),
+    filename: str = Query(None, description="Workbook name when it is sent as the raw request body"),
+    streaming: bool = Query(False, description="Read only the requested sheets, row by row"),
+    stream: bool = Query(False, description="Stream the zip as tables are produced (no X-Style-Cache-Hit-Rate)"),
+    cache: bool = Query(True, description="Use the result cache"),
+    detect: str = Query("rows", description="Table detection: rows (full-width rows) or regions (2D table boxes)"),
+    output_format: str = Query("xlsx", description="Table files as xlsx (formatted), csv, ndjson or parquet (values only)")
+):
+    error = detect_error(detect) or format_error(output_format)
+    if error:
+        return error
+
+    spool = UploadSpool()
+    try:
+        sources, response = await receive_uploads(request, spool, filename)
+        if response is None and len(sources) != 1:
+            response = {"error": f"❌ Upload one workbook, got {len(sources)}"}
+        if response is None:
+            response = await run_in_threadpool(
+                extract_download, sources[0], start_sheet, end_sheet, streaming, stream, cache, detect, output_format
+            )
+    except BaseException:
+        spool.close()
+        raise
+    return close_after(response, spool)
 
-    extract_tables_with_formatting(excel_path, output_dir, start_sheet, end_sheet)
+class ExtractItem(BaseModel):
+    excel_path: str
+    start_sheet: str
+    end_sheet: str
 
-    zip_path = f"tables_{session_id}.zip"
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file in os.listdir(output_dir):
-            zipf.write(os.path.join(output_dir, file), arcname=file)
+@app.post("/extract/batch")
+def extract_batch(
+    items: List[ExtractItem] = Body(..., embed=True, description="Workbooks and sheet ranges to extract"),
+    workers: int = Query(None, description="Worker processes, defaults to EXTRACT_WORKERS"),
+    streaming: bool = Query(False, description="Read only the requested sheets, row by row"),
+    stream: bool = Query(False, description="Stream the zip as items finish (no X-Items-Failed)"),
+    detect: str = Query("rows", description="Table detection: rows (full-width rows) or regions (2D table boxes)"),
+    output_format: str = Query("xlsx", description="Table files as xlsx (formatted), csv, ndjson or parquet (values only)")
+):
+    error = detect_error(detect) or format_error(output_format)
+    if error:
+        return error
+    if not items:
+        return JSONResponse({"error": "❌ No items to extract"}, status_code=422)
 
-    # Clean up extracted xlsx files (optional)
-    for file in os.listdir(output_dir):
-        os.remove(os.path.join(output_dir, file))
-    os.rmdir(output_dir)
+    specs = [item.model_dump() for item in items]
+    if stream:
+        entries = iter_batch_entries(specs, workers, streaming, detect, output_format)
+        return zip_download(iter_zip(entries), "extracted_tables.zip")
 
-    return FileResponse(zip_path, filename="extracted_tables.zip", media_type="application/zip")
+    report = []
+    with timing(StageTimer()) as timer:
+        zip_file, _ = spool_zip(iter_batch_entries(specs, workers, streaming, detect, output_format, report))
+    headers = {
+        "X-Items-Processed": str(sum(1 for entry in report if not entry["error"])),
+        "X-Items-Failed": str(sum(1 for entry in report if entry["error"])),
+        **timing_headers(timer),
+    }
+    return zip_response(zip_file, "extracted_tables.zip", headers=headers)
 
-OUTPUT_FOLDER = "generated_rules"
 ZIP_NAME = "generated_rules.zip"
-PREFIX = "KEY-GR"
 GROUP_NAME = "ball_disc_gate_material"
 
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+def compact_rule_file(data, excel_file, compaction=None):
+    """Compact the rules of one rule file, appending its compact_rules counters to compaction"""
+    rules, stats = compact_rules(decode_rules(data))
+    if compaction is not None:
+        compaction.append(stats)
+    print(f"🗜️ Compacted {stats['rules_in']} rules into {stats['rules_out']} for {excel_file} ({stats['reduction']:.1%} fewer)")
+    return encode_rules(rules)
 
-@app.get("/generate-rules")
-def generate_rules(excel_files_path: str = Query(..., description="Full path to directory containing Excel files")):
-    # Setup output directory
-    if os.path.exists(OUTPUT_FOLDER):
-        shutil.rmtree(OUTPUT_FOLDER)
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+def workbook_paths(excel_files_path):
+    """Paths of the workbooks in a directory"""
+    return [
+        os.path.join(excel_files_path, excel_file)
+        for excel_file in os.listdir(excel_files_path)
+        if excel_file.lower().endswith(WORKBOOK_EXTENSIONS)
+    ]
+
+def rule_file_entries(excel_files_path, header_scan_limit=None, workers=None, progress=None, use_cache=True, incremental=False, reader=None, compact=False, compaction=None):
+    """Yield ("{input}_rules.txt", bytes) for each workbook that produced rules.
+
+    Rules are cached per workbook by content, so unchanged workbooks are not
+    parsed again; only the others go to generate_sheet_rules_for_workbooks.
+    In incremental mode rules are also cached per sheet and only changed
+    sheets are parsed, see incremental_rule_results; it needs the cache, so
+    without it every workbook is parsed. With compact=True each file is
+    run through compact_rules after the cache, and its counters are appended
+    to compaction.
+    """
+    excel_paths = workbook_paths(excel_files_path)
+    if incremental and not (use_cache and result_cache.enabled):
+        print("⚠️ Incremental mode needs the result cache, parsing every workbook")
+    elif incremental:
+        results = incremental_rule_results(
+            excel_paths, result_cache, workers, header_scan_limit, progress,
+            manifest_file=manifest_path(excel_files_path), reader=reader or SHEET_READER
+        )
+        for excel_path, data in results:
+            excel_file = os.path.basename(excel_path)
+            if data is None:
+                continue
+            if data:
+                if compact:
+                    data = compact_rule_file(data, excel_file, compaction)
+                rule_file = f"{os.path.splitext(excel_file)[0]}_rules.txt"
+                print(f"💾 Added rules as {rule_file}")
+                yield rule_file, data
+            else:
+                print(f"❌ No rules generated for {excel_file}")
+        return
+    yield from workbook_rule_entries(excel_paths, header_scan_limit, workers, progress, use_cache, reader, compact, compaction)
+
+def workbook_rule_entries(excel_paths, header_scan_limit=None, workers=None, progress=None, use_cache=True, reader=None, compact=False, compaction=None):
+    """Yield ("{input}_rules.txt", bytes) for each workbook (path or uploaded buffer) that produced rules"""
+    reader = reader or SHEET_READER
+    if progress:
+        progress(files_total=len(excel_paths))
     
-    rule_files_created = []
-    processed_count = 0
+    keys = {}
+    cached = {}
+    # Hashing the workbooks is only worth it if the results can be cached
+    use_cache = use_cache and result_cache.enabled
+    if use_cache:
+        keys = {
+            excel_path: result_cache.key("rules", file_digest(excel_path), PREFIX, header_scan_limit, reader)
+            for excel_path in excel_paths
+        }
+        for excel_path in excel_paths:
+            hit = result_cache.get(keys[excel_path])
+            if hit is not None:
+                cached[excel_path] = hit[0]
     
-    # Process each Excel file
-    for excel_file in os.listdir(excel_files_path):
-        if not excel_file.lower().endswith((".xlsx", ".xls")):
-            continue
-        
-        excel_path = os.path.join(excel_files_path, excel_file)
+    def report(**info):
+        # files_total above already counts the cached workbooks
+        info.pop("files_total", None)
+        if progress and info:
+            progress(**info)
+    
+    misses = [excel_path for excel_path in excel_paths if excel_path not in cached]
+    results = generate_sheet_rules_for_workbooks([(excel_path, None) for excel_path in misses], workers, header_scan_limit, report, reader)
+    
+    for excel_path in excel_paths:
+        excel_file = source_name(excel_path)
         input_filename = os.path.splitext(excel_file)[0]
-        print(f"\nProcessing file: {excel_file}")
-        
-        try:
-            xls = pd.ExcelFile(excel_path)
-            sheet_names = xls.sheet_names
-        except Exception as e:
-            print(f"❌ Could not open {excel_file}: {e}")
-            continue
         
-        all_rules = []
-        
-        # Process each sheet
-        for sheet_name in sheet_names:
-            print(f"  - Sheet: {sheet_name}")
-            try:
-                # Read raw data without headers
-                raw_df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-                
-                # Find best header row
-                header_row_idx = find_header_row(raw_df)
-                
-                # Read with detected header
-                df = pd.read_excel(
-                    xls, 
-                    sheet_name=sheet_name, 
-                    header=header_row_idx
-                )
-                
-                # Clean and normalize data
-                df = clean_dataframe(df)
-                
-                # Skip empty sheets
-                if df.empty:
-                    print("    ⚠️ Empty sheet, skipping")
-                    continue
-                
-                # Generate rules from this sheet
-                sheet_rules = generate_rules_from_sheet(df, sheet_name)
-                all_rules.extend(sheet_rules)
-                print(f"    ✅ Generated {len(sheet_rules)} rules")
-                
-            except Exception as e:
-                print(f"    ⚠️ Error processing sheet: {str(e)}")
+        if excel_path in cached:
+            data = cached[excel_path]
+            print(f"\n♻️ Using cached rules for {excel_file}")
+            report(file=excel_file)
+        else:
+            _, sheet_rules = next(results)
+            
+            # Workbook could not be opened
+            if sheet_rules is None:
                 continue
+            
+            all_rules = [rule for _, rules in sheet_rules for rule in rules or []]
+            data = encode_rules(all_rules)
+            # A workbook with a sheet that failed is parsed again next time
+            if use_cache and all(rules is not None for _, rules in sheet_rules):
+                result_cache.put(keys[excel_path], data, {"rules": len(all_rules)})
         
-        # Save rules for this file
-        if all_rules:
-            output_file = os.path.join(OUTPUT_FOLDER, f"{input_filename}_rules.txt")
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write("\n".join([rule + ";" for rule in all_rules]))
-            rule_files_created.append(output_file)
-            processed_count += 1
-            print(f"💾 Saved {len(all_rules)} rules to {output_file}")
+        if data:
+            if compact:
+                data = compact_rule_file(data, excel_file, compaction)
+            rule_file = f"{input_filename}_rules.txt"
+            print(f"💾 Added rules as {rule_file}")
+            yield rule_file, data
         else:
             print(f"❌ No rules generated for {excel_file}")
+
+def compaction_headers(compaction):
+    """Rule counts before and after compaction, empty if the run was not compacted"""
+    if not compaction:
+        return {}
+    stats = compaction_stats(compaction)
+    return {
+        "X-Rules-Before-Compaction": str(stats["rules_in"]),
+        "X-Rules-After-Compaction": str(stats["rules_out"]),
+        "X-Rule-Reduction-Ratio": f"{stats['reduction']:.4f}",
+    }
+
+def reader_error(reader):
+    """Error for a reader that doesn't exist or isn't installed, None if it can be used"""
+    if reader is None or reader_available(reader):
+        return None
+    if reader not in READERS:
+        return {"error": f"❌ Unknown reader: {reader}, choose from {', '.join(READERS)}"}
+    return {"error": f"❌ Reader not installed: {reader}, available: {', '.join(available_readers())}"}
+
+@app.get("/generate-rules")
+def generate_rules(
+    excel_files_path: str = Query(..., description="Full path to directory containing Excel files"),
+    header_scan_limit: int = Query(None, ge=1, description="Only look for the header in the first N rows"),
+    workers: int = Query(None, description="Worker processes, defaults to RULE_WORKERS"),
+    stream: bool = Query(False, description="Stream the zip as rule files are produced (no X-Files-Processed)"),
+    cache: bool = Query(True, description="Use the result cache"),
+    incremental: bool = Query(False, description="Only re-parse sheets that changed since the last run"),
+    reader: str = Query(None, description="Sheet reader: openpyxl, xml, calamine or xlrd (defaults to SHEET_READER)"),
+    compact: bool = Query(False, description="Merge rules that exclude the same keys and drop duplicates")
+):
+    error = reader_error(reader)
+    if error:
+        return error
+    
+    compaction = []
+    entries = rule_file_entries(excel_files_path, header_scan_limit, workers, use_cache=cache, incremental=incremental, reader=reader, compact=compact, compaction=compaction)
+    return rules_download(entries, stream, compaction)
+
+def rules_download(entries, stream, compaction):
+    """Zip response with the rule files of entries, or a message if no workbook produced rules"""
+    if stream:
+        # Wait for the first rule file so an empty run can still answer with a message
+        entries = peek(entries)
+        if entries is None:
+            return {"message": "No rules generated from any file."}
+        return zip_download(iter_zip(entries), ZIP_NAME)
     
-    # Create ZIP archive
-    if not rule_files_created:
-        return {"message": "No rules generated from any file."}
+    with timing(StageTimer()) as timer:
+        entries = peek(entries)
+        if entries is None:
+            return {"message": "No rules generated from any file."}
+        
+        zip_file, processed_count = spool_zip(entries)
+    headers = {"X-Files-Processed": str(processed_count), **compaction_headers(compaction), **timing_headers(timer)}
+    return zip_response(zip_file, ZIP_NAME, headers=headers)
+
+@app.post("/generate-rules/upload")
+async def generate_rules_upload(
+    request: Request,
+    filename: str = Query(None, description="Workbook or .zip of workbooks name when it is sent as the raw request body"),
+    header_scan_limit: int = Query(None, ge=1, description="Only look for the header in the first N rows"),
+    workers: int = Query(None, description="Worker processes, defaults to RULE_WORKERS"),
+    stream: bool = Query(False, description="Stream the zip as rule files are produced (no X-Files-Processed)"),
+    cache: bool = Query(True, description="Use the result cache"),
+    reader: str = Query(None, description="Sheet reader: openpyxl, xml, calamine or xlrd (defaults to SHEET_READER)"),
+    compact: bool = Query(False, description="Merge rules that exclude the same keys and drop duplicates")
+):
+    error = reader_error(reader)
+    if error:
+        return error
+
+    spool = UploadSpool()
+    try:
+        sources, response = await receive_uploads(request, spool, filename, archives=True)
+        if response is None:
+            compaction = []
+            entries = workbook_rule_entries(sources, header_scan_limit, workers, use_cache=cache, reader=reader, compact=compact, compaction=compaction)
+            response = await run_in_threadpool(rules_download, entries, stream, compaction)
+    except BaseException:
+        spool.close()
+        raise
+    return close_after(response, spool)
+
+def rule_index(excel_files_path, header_scan_limit=None, workers=None, reader=None):
+    """Compiled ConstraintIndex of a rules directory, rebuilt once any of its workbooks changes"""
+    def build(index):
+        workbooks = [(excel_path, None) for excel_path in workbook_paths(excel_files_path)]
+        sheets = generate_sheet_rules_for_workbooks(workbooks, workers, header_scan_limit, reader=reader, constraints=True)
+        for excel_path, sheet_constraints in sheets:
+            rule_file = f"{os.path.splitext(os.path.basename(excel_path))[0]}_rules.txt"
+            for _, constraints in sheet_constraints or []:
+                if constraints is not None:
+                    index.add(rule_file, *constraints)
     
-    with zipfile.ZipFile(ZIP_NAME, "w") as zipf:
-        for file_path in rule_files_created:
-            zipf.write(file_path, os.path.basename(file_path))
+    key = (os.path.abspath(excel_files_path), header_scan_limit, reader or SHEET_READER)
+    return constraint_indexes.get(key, directory_fingerprint(excel_files_path), build)
+
+@app.post("/evaluate")
+def evaluate(
+    excel_files_path: str = Query(..., description="Full path to directory containing Excel files"),
+    selected: Optional[List[str]] = Body(None, description="Selected options as Group.Option, or a column name"),
+    configurations: Optional[List[List[str]]] = Body(None, description="Batch of selections, checked one by one"),
+    header_scan_limit: int = Query(None, ge=1, description="Only look for the header in the first N rows"),
+    workers: int = Query(None, description="Worker processes used to compile the index, defaults to RULE_WORKERS"),
+    reader: str = Query(None, description="Sheet reader: openpyxl, xml, calamine or xlrd (defaults to SHEET_READER)")
+):
+    if not os.path.isdir(excel_files_path):
+        return {"error": f"❌ Directory not found: {excel_files_path}"}
+    error = reader_error(reader)
+    if error:
+        return error
+    if selected is None and configurations is None:
+        return JSONResponse({"error": "❌ Send selected or configurations"}, status_code=422)
     
+    index = rule_index(excel_files_path, header_scan_limit, workers, reader)
+    if configurations is not None:
+        return {"index": index.stats(), "results": index.evaluate_many(configurations)}
+    return {"index": index.stats(), **index.evaluate(selected)}
+
+def submit_job(kind, func):
+    try:
+        job = jobs.submit(kind, func)
+    except queue.Full:
+        return JSONResponse({"error": "❌ Job queue is full, try again later"}, status_code=503)
+    return JSONResponse(job.to_dict(jobs.ttl), status_code=202)
+
+@app.post("/jobs/extract")
+def submit_extract_job(
+    excel_path: str = Query(..., description="Full path to Excel file"),
+    start_sheet: str = Query(...),
+    end_sheet: str = Query(...),
+    streaming: bool = Query(False, description="Read only the requested sheets, row by row"),
+    detect: str = Query("rows", description="Table detection: rows (full-width rows) or regions (2D table boxes)"),
+    output_format: str = Query("xlsx", description="Table files as xlsx (formatted), csv, ndjson or parquet (values only)")
+):
+    if not os.path.exists(excel_path):
+        return {"error": f"❌ File not found: {excel_path}"}
+    error = detect_error(detect) or format_error(output_format)
+    if error:
+        return error
+
+    def run(job):
+        zip_path = os.path.join(job.workspace, "extracted_tables.zip")
+        with timing(StageTimer()) as timer, open(zip_path, "wb") as f:
+            chunks, headers = extract_zip_chunks(excel_path, start_sheet, end_sheet, streaming, progress=job.report, detect=detect, output_format=output_format)
+            for chunk in chunks:
+                f.write(chunk)
+        job.headers = {**headers, **timing_headers(timer)}
+        return zip_path
+
+    return submit_job("extract", run)
+
+@app.post("/jobs/generate-rules")
+def submit_generate_rules_job(
+    excel_files_path: str = Query(..., description="Full path to directory containing Excel files"),
+    header_scan_limit: int = Query(None, ge=1, description="Only look for the header in the first N rows"),
+    workers: int = Query(None, description="Worker processes, defaults to RULE_WORKERS"),
+    incremental: bool = Query(False, description="Only re-parse sheets that changed since the last run"),
+    reader: str = Query(None, description="Sheet reader: openpyxl, xml, calamine or xlrd (defaults to SHEET_READER)"),
+    compact: bool = Query(False, description="Merge rules that exclude the same keys and drop duplicates")
+):
+    if not os.path.isdir(excel_files_path):
+        return {"error": f"❌ Directory not found: {excel_files_path}"}
+    error = reader_error(reader)
+    if error:
+        return error
+
+    def run(job):
+        zip_path = os.path.join(job.workspace, ZIP_NAME)
+        compaction = []
+        entries = rule_file_entries(excel_files_path, header_scan_limit, workers, job.report, incremental=incremental, reader=reader, compact=compact, compaction=compaction)
+        with timing(StageTimer()) as timer:
+            processed_count = write_zip(entries, zip_path)
+        if not processed_count:
+            os.remove(zip_path)
+            job.message = "No rules generated from any file."
+            return None
+        job.headers = {"X-Files-Processed": str(processed_count), **compaction_headers(compaction), **timing_headers(timer)}
+        return zip_path
+
+    return submit_job("generate-rules", run)
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+@app.delete("/cache")
+def purge_cache():
+    return {"removed": result_cache.purge()}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": f"❌ Job not found or expired: {job_id}"}, status_code=404)
+    return job.to_dict(jobs.ttl)
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": f"❌ Job not found or expired: {job_id}"}, status_code=404)
+    if job.status != "done":
+        return JSONResponse({"error": f"❌ Job is {job.status}", "job": job.to_dict(jobs.ttl)}, status_code=409)
+    if job.result_path is None:
+        return {"message": job.message}
+
     return FileResponse(
-        ZIP_NAME,
+        job.result_path,
         media_type="application/zip",
-        filename=ZIP_NAME,
-        headers={"X-Files-Processed": str(processed_count)}
+        filename=os.path.basename(job.result_path),
+        headers=job.headers
     )
@@ -0,0 +1,99 @@
+"""Serve the app from worker processes forked from one preloaded copy of it.
+
+Run from the repository root:
+
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+
+The app is imported and warmed up once here, then every worker is forked
+from this process, so pandas, numpy, openpyxl and the app's modules are
+shared copy-on-write instead of being loaded again by each worker as with
+uvicorn --workers. Workers that die are replaced. Needs os.fork (Linux,
+macOS); elsewhere use uvicorn app.main:app --workers N.
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+import time
+import uvicorn
+from .main import app, warm_up_app
+
+# Configuration
+MIN_WORKER_SECONDS = 1  # a worker that dies sooner is not replaced, to avoid a restart loop
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--no-warm-up", action="store_true", help="Fork before loading pandas/numpy/openpyxl, each worker loads them on first use")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not hasattr(os, "fork"):
+        print("❌ Preforking needs os.fork, use uvicorn app.main:app --workers N on this platform")
+        return 1
+
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    config.load()
+    if not args.no_warm_up:
+        warm_up_app()
+    sock = config.bind_socket()
+    # Objects loaded so far are never freed; keeping them out of the collector stops
+    # its bookkeeping from writing to (and so copying) their pages in every worker
+    gc.freeze()
+
+    workers = {}  # pid -> start time
+    stopping = False
+
+    def spawn():
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+            finally:
+                os._exit(0)
+        workers[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(args.workers):
+        spawn()
+    print(f"🚀 Serving on http://{args.host}:{args.port} with {args.workers} workers (pids {', '.join(map(str, workers))})")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if stopping or started is None:
+            continue
+        if time.time() - started < MIN_WORKER_SECONDS:
+            print(f"❌ Worker {pid} exited right after starting (status {status}), shutting down")
+            stop(None, None)
+            continue
+        print(f"⚠️ Worker {pid} exited (status {status}), starting a new one")
+        spawn()
+
+    sock.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
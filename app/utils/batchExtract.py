@@ -0,0 +1,108 @@
+import json
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from .extractTables import extract_tables_with_formatting
+from .metrics import capture, count, replay
+from .processPools import process_pool
+from .uploads import unique_names
+
+# Configuration
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+REPORT_NAME = "batch_report.json"
+
+def extract_batch_item(excel_path, output_dir, start_sheet, end_sheet, streaming=False, detect="rows", output_format="xlsx"):
+    """Extract one batch item into output_dir, returns (files written in order, error or None, metric events).
+
+    Failures are returned rather than raised, so a bad workbook only fails
+    its own item; a failed item reports no files, even if some were written.
+    """
+    written = []
+    with capture() as events:
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            extract_tables_with_formatting(
+                excel_path, output_dir, start_sheet, end_sheet, streaming,
+                detect=detect, output_format=output_format, written=written
+            )
+            error = None
+        except Exception as e:
+            count("errors_total", stage="extract")
+            error = f"{type(e).__name__}: {e}"
+            written = []
+    return written, error, events
+
+def item_folders(items):
+    """Folder name in the archive for each item: the workbook name, numbered when it repeats"""
+    return unique_names(os.path.splitext(os.path.basename(item["excel_path"]))[0] or "workbook" for item in items)
+
+def iter_batch_entries(items, workers=None, streaming=False, detect="rows", output_format="xlsx", report=None, progress=None):
+    """Yield ("{workbook}/{sheet}_{n}.{format}", bytes) for each item in order, then batch_report.json.
+
+    items are dicts with excel_path, start_sheet and end_sheet. With more than
+    one worker they are extracted concurrently in a process pool of at most
+    workers processes (EXTRACT_WORKERS by default), otherwise one by one in
+    this process, each into its own folder of a temporary directory;
+    files are read back and removed as each item is zipped. Every item gets
+    an entry in report (and in batch_report.json) with its folder, tables
+    and error.
+    """
+    workers = min(workers or EXTRACT_WORKERS, len(items)) or 1
+    folders = item_folders(items)
+    if report is None:
+        report = []
+    if progress:
+        progress(files_total=len(items))
+
+    with tempfile.TemporaryDirectory(prefix="batch_") as workspace:
+        def args(i):
+            item = items[i]
+            return (
+                item["excel_path"], os.path.join(workspace, str(i)), item["start_sheet"], item["end_sheet"],
+                streaming, detect, output_format
+            )
+
+        pool = process_pool(workers) if workers > 1 else None
+        try:
+            futures = [
+                pool.submit(extract_batch_item, *args(i)) if pool and os.path.exists(item["excel_path"]) else None
+                for i, item in enumerate(items)
+            ]
+            for i, item in enumerate(items):
+                if not os.path.exists(item["excel_path"]):
+                    written, error, events = [], f"File not found: {item['excel_path']}", []
+                elif pool is None:
+                    written, error, events = extract_batch_item(*args(i))
+                else:
+                    try:
+                        written, error, events = futures[i].result()
+                    except BrokenProcessPool as e:
+                        written, error, events = [], f"Worker process died: {e}", []
+                # Stages and counters of the worker are recorded here, under this request's timer
+                replay(events)
+
+                item_dir = os.path.join(workspace, str(i))
+                for filename in written:
+                    path = os.path.join(item_dir, filename)
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    os.remove(path)
+                    yield f"{folders[i]}/{filename}", data
+
+                if error:
+                    print(f"❌ {folders[i]}: {error}")
+                else:
+                    print(f"📦 {folders[i]}: {len(written)} tables")
+                report.append({
+                    **item,
+                    "folder": folders[i],
+                    "tables": len(written),
+                    "error": error,
+                })
+                if progress:
+                    progress(file=os.path.basename(item["excel_path"]))
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    yield REPORT_NAME, json.dumps(report, indent=1).encode("utf-8")
@@ -0,0 +1,166 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from .generateRules import clean_identifier, format_rule, format_term
+
+# Configuration
+INDEX_LIMIT = int(os.getenv("CONSTRAINT_INDEX_LIMIT", "8"))  # compiled rulesets kept in memory
+
+QUOTED_PART = re.compile(r"'([^']*)'")
+
+@lru_cache(maxsize=65536)
+def _clean(part):
+    return clean_identifier(part.strip())
+
+def candidate_terms(option):
+    """(group, option) terms a selected option may stand for, most specific first.
+
+    Selections may be given as the full term ('KEY-GR'.'Group'.'Option'), as
+    Group.Option or, for option columns whose group and option are the same,
+    by the column name alone. Key values may hold dots themselves (Size.1.5),
+    so every split is a candidate.
+    """
+    if "'" in option:
+        parts = QUOTED_PART.findall(option)
+        return [(_clean(parts[-2]), _clean(parts[-1]))] if len(parts) >= 2 else []
+    candidates = [
+        (_clean(option[:i]), _clean(option[i + 1:]))
+        for i, char in enumerate(option) if char == "."
+    ]
+    candidates.append((_clean(option), _clean(option)))
+    return candidates
+
+def term_name(term):
+    return f"{term[0]}.{term[1]}"
+
+def iter_bits(bits):
+    """Indexes of the set bits of an int, lowest first"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+class ConstraintIndex:
+    """Exclusion rules of one ruleset compiled into bitsets over rule numbers.
+
+    Built from the sheet_constraints of each sheet, so every key and option
+    column of the sheets is known, including those without any exclusion.
+    For every (group, option) term, key_rules holds the rules with that term
+    on their left-hand side and option_rules the rules with it on their
+    right-hand side. A selection violates the rules set in both the OR of its
+    key_rules and the OR of its option_rules, so a lookup is a handful of int
+    ORs and one AND however many rules there are.
+    """
+
+    def __init__(self):
+        self.rules = []  # (rule file, rule text) per rule number
+        self._numbers = {}  # rule text -> rule number, rules repeated across sheets or files are kept once
+        self.terms = set()
+        self.key_rules = {}
+        self.option_rules = {}
+        self.built_at = time.time()
+        self.build_seconds = 0.0
+
+    def add(self, rule_file, keys, options, exclusions):
+        """Add the sheet_constraints of one sheet, its rules listed under rule_file"""
+        self.terms.update(keys)
+        self.terms.update(options)
+        for key_terms, option_terms in exclusions:
+            rule = format_rule([format_term(*term) for term in key_terms], [format_term(*term) for term in option_terms])
+            if rule in self._numbers:
+                continue
+            self._numbers[rule] = len(self.rules)
+            bit = 1 << len(self.rules)
+            self.rules.append((rule_file, rule))
+            for term in key_terms:
+                self.terms.add(term)
+                self.key_rules[term] = self.key_rules.get(term, 0) | bit
+            for term in option_terms:
+                self.terms.add(term)
+                self.option_rules[term] = self.option_rules.get(term, 0) | bit
+
+    def resolve(self, option):
+        """The known term a selected option stands for, None if it is not in the ruleset"""
+        for term in candidate_terms(option):
+            if term in self.terms:
+                return term
+        return None
+
+    def evaluate(self, selected):
+        """{"valid", "violations", "unknown"} for one set of selected options"""
+        keys = options = 0
+        terms = []
+        unknown = []
+        for option in selected:
+            term = self.resolve(option)
+            if term is None:
+                unknown.append(option)
+                continue
+            terms.append(term)
+            keys |= self.key_rules.get(term, 0)
+            options |= self.option_rules.get(term, 0)
+
+        violations = []
+        for number in iter_bits(keys & options):
+            bit = 1 << number
+            rule_file, rule = self.rules[number]
+            violations.append({
+                "rule_file": rule_file,
+                "rule": rule,
+                "keys": [term_name(term) for term in terms if self.key_rules.get(term, 0) & bit],
+                "options": [term_name(term) for term in terms if self.option_rules.get(term, 0) & bit],
+            })
+        return {"valid": not violations, "violations": violations, "unknown": unknown}
+
+    def evaluate_many(self, configurations):
+        return [self.evaluate(selected) for selected in configurations]
+
+    def stats(self):
+        return {
+            "rules": len(self.rules),
+            "options": len(self.terms),
+            "built_at": self.built_at,
+            "build_seconds": self.build_seconds,
+        }
+
+def directory_fingerprint(excel_files_path):
+    """Name, mtime and size of each workbook in a directory, changes when any of them does"""
+    fingerprint = []
+    for entry in os.scandir(excel_files_path):
+        if entry.name.lower().endswith((".xlsx", ".xls")):
+            stat = entry.stat()
+            fingerprint.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(fingerprint))
+
+class ConstraintIndexes:
+    """Compiled indexes by ruleset, rebuilt when the ruleset's workbooks change.
+
+    Holds at most limit indexes and drops the least recently used one first.
+    """
+
+    def __init__(self, limit=INDEX_LIMIT):
+        self.limit = limit
+        self._indexes = OrderedDict()  # key -> (fingerprint, index)
+        self._lock = threading.Lock()
+
+    def get(self, key, fingerprint, build):
+        """Index for key, calling build(ConstraintIndex) to compile it if missing or stale"""
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                self._indexes.move_to_end(key)
+                return cached[1]
+
+        start = time.perf_counter()
+        index = ConstraintIndex()
+        build(index)
+        index.build_seconds = time.perf_counter() - start
+        with self._lock:
+            self._indexes[key] = (fingerprint, index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.limit:
+                self._indexes.popitem(last=False)
+        return index
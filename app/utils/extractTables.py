@@ -1,7 +1,16 @@
+import io
 import os
 from copy import copy
-from fastapi.responses import FileResponse
-from openpyxl import load_workbook, Workbook
+from .lazyImports import lazy_module
+from .metrics import count, stage, timed
+from .sheetReaders import OpenpyxlReader, iter_sheet_rows
+from .tableFormats import encode_table
+from .uploads import source_name, source_size
+
+openpyxl = lazy_module("openpyxl")
+
+TABLE_DETECTORS = ("rows", "regions")
+REGION_GAP_COLUMNS = 1  # blank columns a table may have between its columns, like a spacer column
 
 def is_colored(cell):
     fill = cell.fill
@@ -12,57 +21,365 @@ def is_data_row(row):
 
 def copy_cell_format(source_cell, target_cell):
     target_cell.value = source_cell.value
-    if source_cell.has_style:
+    # Read-only sheets pad missing cells with EmptyCell, which has no style
+    if getattr(source_cell, "has_style", False):
         target_cell.fill = copy(source_cell.fill)
         target_cell.font = copy(source_cell.font)
         target_cell.border = copy(source_cell.border)
         target_cell.alignment = copy(source_cell.alignment)
         target_cell.number_format = source_cell.number_format
 
-def extract_tables_with_formatting(excel_path, output_dir, start_sheet, end_sheet):
-    wb = load_workbook(excel_path)
-    all_sheets = wb.sheetnames
+class StyleCache:
+    """Intern source cell styles into one target workbook.
+
+    Each distinct source style is copied once; later cells with the same style
+    reuse the interned style ids instead of copying fill/font/border/alignment.
+    """
+
+    def __init__(self):
+        self.styles = {}
+        self.hits = 0
+        self.misses = 0
+
+    def copy_cell(self, source_cell, target_cell):
+        target_cell.value = source_cell.value
+        if not getattr(source_cell, "has_style", False):
+            return
+
+        # Full and read-only cells both keep their style ids in a StyleArray
+        source_style = getattr(source_cell, "style_array", None) or source_cell._style
+        key = tuple(source_style)
+        target_style = self.styles.get(key)
+        if target_style is None:
+            self.misses += 1
+            copy_cell_format(source_cell, target_cell)
+            self.styles[key] = copy(target_cell._style)
+        else:
+            self.hits += 1
+            target_cell._style = copy(target_style)
+
+def style_cache_stats(caches):
+    """Combine the counters of several StyleCache objects"""
+    hits = sum(cache.hits for cache in caches)
+    misses = sum(cache.misses for cache in caches)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else 0.0,
+    }
+
+def iter_table_blocks(rows):
+    """Yield (header_block, body_block) for each table block in a stream of rows.
+
+    Only the run of non-empty rows directly above the current row is kept, which
+    is all the backward header walk ever looks at.
+    """
+    current_block = []
+    header_block = []
+    trailing_rows = []
+    inside_block = False
+
+    for row in rows:
+        if any(is_colored(cell) for cell in row) or is_data_row(row):
+            if not inside_block:
+                header_block = list(trailing_rows)
+                inside_block = True
+            current_block.append(row)
+        else:
+            if inside_block:
+                yield header_block, current_block
+                current_block = []
+                inside_block = False
+
+        if any(cell.value for cell in row):
+            trailing_rows.append(row)
+        else:
+            trailing_rows = []
+
+    if inside_block and current_block:
+        yield header_block, current_block
+
+def is_marked(cell):
+    """Cell holds a value or a fill color; read-only padding (EmptyCell) has neither"""
+    return cell.value not in (None, "") or (cell.fill is not None and is_colored(cell))
+
+def _rows_overlap(a, b):
+    return a[0] <= b[2] and b[0] <= a[2]
+
+def _column_gap(a, b):
+    """Blank columns between two boxes, negative if their columns overlap"""
+    return max(a[1], b[1]) - min(a[3], b[3]) - 1
+
+def _joins(a, b):
+    return _rows_overlap(a, b) and _column_gap(a, b) <= REGION_GAP_COLUMNS
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+class TableRegions:
+    """Find rectangular table regions from the marked columns of each row, top to bottom.
+
+    Marked cells are joined into runs per row, and a run touching a run of
+    the row above (diagonals included) joins its region. A region closes at
+    the first row where none of its runs continue. A closed region is merged
+    with one sharing its rows at most REGION_GAP_COLUMNS blank columns away,
+    so a spacer column (or a Date column or note just past one) stays with
+    its table. Anything further away is a region of its own, and a single
+    cell that joined nothing is dropped.
+    Regions are boxes (min_row, min_col, max_row, max_col), handed out top to
+    bottom then left to right as soon as no open region can still reach them.
+    """
+
+    def __init__(self):
+        self.open = []  # [box, runs on its last row]
+        self.pending = []
+        self.row = None
+
+    def add_row(self, row, columns):
+        """Feed the sorted marked columns of a row, returns the regions now complete"""
+        runs = []
+        for column in columns:
+            if runs and column == runs[-1][1] + 1:
+                runs[-1] = (runs[-1][0], column)
+            else:
+                runs.append((column, column))
+
+        continuing = self.open if self.row == row - 1 else []
+        closed = [] if continuing else self.open
+
+        # Runs touching the same region of the row above end up in one group
+        parent = list(range(len(runs)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        first_run = {}  # region -> first run touching it
+        touching = [[] for _ in runs]
+        for i, (start, end) in enumerate(runs):
+            for j, (_, region_runs) in enumerate(continuing):
+                if any(start <= other_end + 1 and other_start <= end + 1 for other_start, other_end in region_runs):
+                    touching[i].append(j)
+                    if j in first_run:
+                        parent[find(i)] = find(first_run[j])
+                    else:
+                        first_run[j] = i
+
+        groups = {}
+        for i, (start, end) in enumerate(runs):
+            box, group_runs = groups.get(find(i), ((row, start, row, end), []))
+            box = _union(box, (row, start, row, end))
+            for j in touching[i]:
+                box = _union(box, continuing[j][0])
+            groups[find(i)] = (box, group_runs + [(start, end)])
+
+        closed += [region for j, region in enumerate(continuing) if j not in first_run]
+        self.open = [[box, group_runs] for box, group_runs in groups.values()]
+        self.row = row
+        for region in closed:
+            self._close(region[0])
+        return self._ready()
+
+    def finish(self):
+        """Close every open region and return all remaining regions"""
+        closed, self.open = self.open, []
+        for region in closed:
+            self._close(region[0])
+        return self._ready()
+
+    def _close(self, box):
+        for region in self.open:
+            if _joins(box, region[0]):
+                region[0] = _union(box, region[0])
+                return
+        merged = True
+        while merged:
+            merged = False
+            for i, other in enumerate(self.pending):
+                if _joins(box, other):
+                    box = _union(box, self.pending.pop(i))
+                    merged = True
+                    break
+        self.pending.append(box)
+
+    def _ready(self):
+        self.pending.sort()
+        ready = []
+        # An open region reaching a pending one's rows could still grow into it
+        while self.pending and all(region[0][0] > self.pending[0][2] for region in self.open):
+            box = self.pending.pop(0)
+            # A cell that joined no region by now never will
+            if box[:2] != box[2:]:
+                ready.append(box)
+        return ready
+
+def find_table_regions(marks):
+    """Table regions of {row: [marked column, ...]}, see TableRegions"""
+    regions = TableRegions()
+    found = []
+    for row in sorted(marks):
+        found += regions.add_row(row, sorted(marks[row]))
+    return found + regions.finish()
+
+def iter_region_rows(book, sheet_name):
+    """Yield (region, rows) for each table region of a sheet of an OpenpyxlReader, rows trimmed to the region's columns.
+
+    Full worksheets are scanned through the cells that exist and each region
+    is read afterwards. Streamed sheets are read once; rows are kept only
+    while a region that may contain them is still open.
+    """
+    if not book.streaming:
+        marks = {}
+        # Only the cells that exist, reading rows would create every cell up to max_column
+        for cell in book.styled_cells(sheet_name):
+            if is_marked(cell):
+                marks.setdefault(cell.row, []).append(cell.column)
+        for region in find_table_regions(marks):
+            yield region, book.styled_range(sheet_name, *region)
+        return
+
+    regions = TableRegions()
+    kept = {}
+
+    def sliced(ready):
+        for min_row, min_col, max_row, max_col in ready:
+            rows = [kept[row_idx][min_col - 1:max_col] for row_idx in range(min_row, max_row + 1)]
+            yield (min_row, min_col, max_row, max_col), rows
+
+    for row_idx, row in enumerate(book.styled_rows(sheet_name), start=1):
+        columns = [c_idx for c_idx, cell in enumerate(row, start=1) if is_marked(cell)]
+        if not columns:
+            ready = regions.add_row(row_idx, columns) if regions.open else []
+        else:
+            kept[row_idx] = row
+            ready = regions.add_row(row_idx, columns)
+        yield from sliced(ready)
+        if ready or not columns:
+            # Rows above every open or pending region are no longer needed
+            needed = min([region[0][0] for region in regions.open] + [box[0] for box in regions.pending] + [row_idx + 1])
+            for done in [kept_idx for kept_idx in kept if kept_idx < needed]:
+                del kept[done]
+    yield from sliced(regions.finish())
+
+def iter_sheet_blocks(book, sheet_name, detect="rows"):
+    """Yield (header_block, body_block) for each table of a sheet of an OpenpyxlReader.
+
+    detect="rows" walks full-width rows of the whole sheet; detect="regions"
+    finds the rectangular table regions first and walks the rows of each,
+    trimmed to its columns, so side by side tables come out separately.
+    """
+    if detect == "rows":
+        yield from iter_table_blocks(book.styled_rows(sheet_name))
+        return
+    for _, rows in iter_region_rows(book, sheet_name):
+        yield from iter_table_blocks(rows)
+
+def iter_table_block_rows(excel_path, start_sheet, end_sheet, streaming=False, progress=None, detect="rows"):
+    """Yield ("{sheet}_{n}", sheet_name, rows) for every table block of start_sheet..end_sheet.
+
+    rows are the block's header rows followed by its body, as source cells.
+    The workbook is read through an OpenpyxlReader; with streaming=True it is
+    opened read-only, so only the requested sheets are parsed and rows are
+    read one at a time instead of all at once.
+    progress, if given, is called with file=/sheet= after each sheet. detect
+    picks how tables are found, see iter_sheet_blocks.
+    """
+    excel_file = source_name(excel_path)
+    with stage("open", excel_file):
+        book = OpenpyxlReader(excel_path, streaming)
+    count("bytes_read_total", source_size(excel_path))
+    all_sheets = book.sheet_names
 
     start_index = all_sheets.index(start_sheet)
     end_index = all_sheets.index(end_sheet)
     sheets_to_extract = all_sheets[start_index:end_index + 1]
+    if progress:
+        progress(files_total=1, sheets_total=len(sheets_to_extract))
 
-    for sheet_name in sheets_to_extract:
-        ws = wb[sheet_name]
-        rows = list(ws.iter_rows())
-        table_blocks = []
-        current_block = []
-        block_start_indices = []
-        inside_block = False
-
-        for i, row in enumerate(rows):
-            if any(is_colored(cell) for cell in row) or is_data_row(row):
-                if not inside_block:
-                    block_start_indices.append(i)
-                    inside_block = True
-                current_block.append(row)
-            else:
-                if inside_block:
-                    table_blocks.append((block_start_indices[-1], current_block))
-                    current_block = []
-                    inside_block = False
-
-        if inside_block and current_block:
-            table_blocks.append((block_start_indices[-1], current_block))
-
-        for idx, (start_row_idx, body_block) in enumerate(table_blocks):
-            header_block = []
-            for j in range(start_row_idx - 1, -1, -1):
-                if any(cell.value for cell in rows[j]):
-                    header_block.insert(0, rows[j])
-                else:
-                    break
+    with book:
+        for sheet_name in sheets_to_extract:
+            # Row reading and block detection interleave, time them together as one stage
+            blocks = timed(iter_sheet_blocks(book, sheet_name, detect), "scan", excel_file, sheet_name)
+            for idx, (header_block, body_block) in enumerate(blocks):
+                full_block = header_block + body_block
+                if full_block:
+                    count("tables_extracted_total")
+                    yield f"{sheet_name}_{idx+1}", sheet_name, full_block
+
+            if progress:
+                progress(file=excel_file, sheet=sheet_name)
+
+    if progress:
+        progress(file=excel_file)
+
+def iter_table_workbooks(excel_path, start_sheet, end_sheet, streaming=False, progress=None, style_caches=None, detect="rows"):
+    """Yield ("{sheet}_{n}.xlsx", Workbook) for every table block of start_sheet..end_sheet.
+
+    Cells are copied with their formatting and the StyleCache of every table
+    is appended to style_caches. See iter_table_block_rows for the rest.
+    """
+    if style_caches is None:
+        style_caches = []
+    excel_file = source_name(excel_path)
+    for name, sheet_name, full_block in iter_table_block_rows(
+        excel_path, start_sheet, end_sheet, streaming, progress, detect
+    ):
+        with stage("copy", excel_file, sheet_name):
+            new_wb = openpyxl.Workbook()
+            new_ws = new_wb.active
+            style_cache = StyleCache()
+            for r_idx, row in enumerate(full_block, start=1):
+                for c_idx, cell in enumerate(row, start=1):
+                    style_cache.copy_cell(cell, new_ws.cell(row=r_idx, column=c_idx))
+            style_caches.append(style_cache)
+        yield f"{name}.xlsx", new_wb
+
+    stats = style_cache_stats(style_caches)
+    print(f"🎨 Style cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate)")
+
+def iter_table_files(excel_path, start_sheet, end_sheet, streaming=False, progress=None, style_caches=None, detect="rows", output_format="xlsx"):
+    """Yield ("{sheet}_{n}.{format}", bytes) for every table block of start_sheet..end_sheet.
+
+    xlsx tables are copied with their formatting, see iter_table_workbooks.
+    The other OUTPUT_FORMATS write cell values only and never touch styles.
+    """
+    excel_file = source_name(excel_path)
+    if output_format == "xlsx":
+        for filename, new_wb in iter_table_workbooks(
+            excel_path, start_sheet, end_sheet, streaming, progress, style_caches, detect
+        ):
+            with stage("write", excel_file):
+                buffer = io.BytesIO()
+                new_wb.save(buffer)
+            yield filename, buffer.getvalue()
+        return
+
+    for name, sheet_name, full_block in iter_table_block_rows(
+        excel_path, start_sheet, end_sheet, streaming, progress, detect
+    ):
+        with stage("copy", excel_file, sheet_name):
+            rows = [[cell.value for cell in row] for row in full_block]
+        with stage("write", excel_file, sheet_name):
+            data = encode_table(rows, output_format)
+        yield f"{name}.{output_format}", data
+
+def extract_tables_with_formatting(excel_path, output_dir, start_sheet, end_sheet, streaming=False, progress=None, detect="rows", output_format="xlsx", written=None):
+    """Write every table block of the sheets start_sheet..end_sheet to its own file.
 
-            full_block = header_block + body_block
-            if full_block:
-                new_wb = Workbook()
-                new_ws = new_wb.active
-                for r_idx, row in enumerate(full_block, start=1):
-                    for c_idx, cell in enumerate(row, start=1):
-                        copy_cell_format(cell, new_ws.cell(row=r_idx, column=c_idx))
-                new_wb.save(os.path.join(output_dir, f"{sheet_name}_{idx+1}.xlsx"))
+    output_format is xlsx (with formatting) or one of the values-only
+    OUTPUT_FORMATS. See iter_table_block_rows for streaming, progress and detect.
+    The name of each file is appended to written as it is written.
+    Returns the style cache counters for the written tables.
+    """
+    style_caches = []
+    for filename, data in iter_table_files(
+        excel_path, start_sheet, end_sheet, streaming, progress, style_caches, detect, output_format
+    ):
+        with open(os.path.join(output_dir, filename), "wb") as f:
+            f.write(data)
+        if written is not None:
+            written.append(filename)
+    return style_cache_stats(style_caches)
@@ -1,11 +1,19 @@
 import re
-import pandas as pd
-from fastapi import FastAPI
+from datetime import datetime, timedelta
+from functools import lru_cache
+from .lazyImports import lazy_module
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
 
 # Configuration
 OUTPUT_FOLDER = "generated_rules"
 ZIP_NAME = "generated_rules.zip"
 PREFIX = "KEY-GR"
+HEADER_SCAN_CHUNK = 4096  # rows scored per numpy batch in find_header_row
+
+# Identifiers go through clean_identifier, so terms hold no commas or parentheses
+RULE_PATTERN = re.compile(r"AnyTrue\((.*)\) Excludes AnyTrue\((.*)\)")
 
 def clean_identifier(s):
     """Clean and normalize identifiers for rules"""
@@ -14,16 +22,87 @@ def clean_identifier(s):
     s = re.sub(r'\s+', '_', s)      # Replace spaces with underscores
     return s
 
-def find_key_column(df):
+def read_sheet_grid(xls, sheet_name):
+    """Parse a sheet once into a grid of raw, unconverted cell values"""
+    raw = pd.read_excel(xls, sheet_name=sheet_name, header=None, dtype=object, na_filter=False)
+    return raw.values.tolist()
+
+def frame_from_grid(grid, header=None):
+    """Build the DataFrame pd.read_excel would return for the given header row"""
+    if not grid:
+        return pd.DataFrame()
+    # Same parser settings pandas uses for Excel sheets
+    parser = pd.io.parsers.TextParser([list(row) for row in grid], header=header, skip_blank_lines=False)
+    return parser.read()
+
+@lru_cache(maxsize=None)
+def _as_text():
+    """Elementwise str() into an object array; unlike astype(str) it isn't padded to the longest cell"""
+    return np.frompyfunc(str, 1, 1)
+
+def _text_lengths(strings):
+    return np.fromiter((len(text) for text in strings), dtype=np.int64, count=len(strings))
+
+def _strip_text(strings):
+    """Stripped copy of a 1D object array of strings and the stripped lengths, each distinct string done once"""
+    codes, distinct = pd.factorize(strings)
+    stripped = np.array([text.strip() for text in distinct], dtype=object)
+    return stripped[codes], _text_lengths(stripped)[codes]
+
+class SheetColumns:
+    """Normalized per-column views of a cleaned sheet, built once and shared.
+
+    text holds each column as astype(str).str.strip() would give it, as an
+    object array, next to the null mask, distinct-value count and mean string
+    length.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.text = {}
+        self.null_mask = {}
+        self.nunique = {}
+        self.mean_len = {}
+        self._upper = {}
+
+    def add(self, col, text, null_mask, nunique, lengths):
+        self.text[col] = text
+        self.null_mask[col] = null_mask
+        self.nunique[col] = nunique
+        # Same float sum / count that Series.mean() does
+        self.mean_len[col] = lengths.sum(dtype=np.float64) / len(lengths) if len(lengths) else np.nan
+
+    def upper(self, col):
+        """Upper-cased text view, computed on first use"""
+        if col not in self._upper:
+            # Option columns hold a handful of distinct values, upper-case those
+            codes, distinct = pd.factorize(self.text[col])
+            self._upper[col] = np.array([text.upper() for text in distinct], dtype=object)[codes]
+        return self._upper[col]
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the views from an already cleaned DataFrame"""
+        columns = cls(len(df))
+        for i, col in enumerate(df.columns):
+            series = df.iloc[:, i]
+            strings = series.astype(str).to_numpy(dtype=object)
+            text, _ = _strip_text(strings)
+            columns.add(
+                col,
+                text,
+                series.isna().to_numpy(),
+                series.nunique(),
+                _text_lengths(strings),
+            )
+        return columns
+
+def find_key_column(df, columns=None):
     """Dynamically identify the key column (valve identifiers)"""
-    # Calculate uniqueness scores
-    uniqueness = {col: df[col].nunique() for col in df.columns}
-    
-    # Calculate value length scores
-    length_scores = {}
-    for col in df.columns:
-        avg_len = df[col].astype(str).str.len().mean()
-        length_scores[col] = avg_len
+    if df.columns.has_duplicates:
+        raise ValueError(f"Duplicate column names: {list(df.columns[df.columns.duplicated()])}")
+    if columns is None:
+        columns = SheetColumns.from_frame(df)
     
     # Find best candidate
     best_col = None
@@ -31,13 +110,13 @@ def find_key_column(df):
     
     for col in df.columns:
         # Skip columns with mostly empty values
-        empty_ratio = df[col].isna().mean()
+        empty_ratio = columns.null_mask[col].mean()
         if empty_ratio > 0.5:
             continue
             
         # Calculate composite score
-        uniqueness_score = uniqueness[col] / len(df)
-        length_score = 1 - (length_scores[col] / (length_scores[col] + 10))
+        uniqueness_score = columns.nunique[col] / len(df)
+        length_score = 1 - (columns.mean_len[col] / (columns.mean_len[col] + 10))
         score = uniqueness_score * 0.7 + length_score * 0.3
         
         if score > best_score:
@@ -46,83 +125,240 @@ def find_key_column(df):
     
     return best_col
 
-def find_header_row(raw_df):
-    """Dynamically locate the header row"""
-    # Calculate row complexity scores
-    row_scores = []
-    for idx, row in raw_df.iterrows():
-        # Count non-empty cells
+def _score_rows(values):
+    """Header scores for a 2D object array, one per row"""
+    null_mask = pd.isna(values)
+    valid = ~null_mask
+
+    # Nulls become "" so they neither add length nor a distinct value
+    cells = np.where(null_mask, "", values)
+    codes, distinct = pd.factorize(_as_text()(cells).ravel())
+    codes = codes.reshape(cells.shape)
+
+    # Count non-empty cells
+    non_empty = valid.sum(axis=1)
+
+    # Count unique stripped values per row via integer codes, stripping each distinct string once
+    stripped_codes, _ = pd.factorize(np.array([text.strip() for text in distinct], dtype=object))
+    unique_codes = np.where(valid, stripped_codes[codes], -1)
+    unique_codes.sort(axis=1)
+    is_new = unique_codes >= 0
+    is_new[:, 1:] &= unique_codes[:, 1:] != unique_codes[:, :-1]
+    unique_vals = is_new.sum(axis=1)
+
+    # Calculate string complexity
+    lengths = _text_lengths(distinct)[codes]
+    lengths = np.where(valid, lengths, 0).sum(axis=1)
+    str_complexity = lengths / np.maximum(non_empty, 1)
+
+    # Composite score
+    return (non_empty * 0.4) + (unique_vals * 0.4) + (str_complexity * 0.2)
+
+def _score_rows_iter(raw_df):
+    """Row-by-row scorer for frames numpy cannot stringify like pandas does"""
+    scores = []
+    for _, row in raw_df.iterrows():
         non_empty = row.notna().sum()
-        
-        # Count unique values
         unique_vals = row.dropna().astype(str).str.strip().nunique()
-        
-        # Calculate string complexity
         str_complexity = row.dropna().astype(str).str.len().sum() / (non_empty or 1)
-        
-        # Composite score
-        score = (non_empty * 0.4) + (unique_vals * 0.4) + (str_complexity * 0.2)
-        row_scores.append((idx, score))
-    
-    # Sort by score descending
-    row_scores.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return best candidate
-    return row_scores[0][0] if row_scores else 0
+        scores.append((non_empty * 0.4) + (unique_vals * 0.4) + (str_complexity * 0.2))
+    return np.array(scores, dtype=float)
 
-def clean_dataframe(df):
-    """Clean and normalize dataframe"""
+@lru_cache(maxsize=None)
+def _is_temporal():
+    """Elementwise datetime/timedelta check, built on first use so numpy loads lazily"""
+    return np.frompyfunc(
+        lambda v: isinstance(v, (datetime, timedelta, np.datetime64, np.timedelta64)), 1, 1
+    )
+
+def _temporal_rows(values):
+    """Rows whose non-empty cells are all datetimes or timedeltas"""
+    valid = ~pd.isna(values)
+    temporal = _is_temporal()(values).astype(bool) & valid
+    return valid.any(axis=1) & (temporal.sum(axis=1) == valid.sum(axis=1))
+
+def find_header_row(raw_df, scan_limit=None):
+    """Dynamically locate the header row, optionally within the first scan_limit rows"""
+    if scan_limit is not None:
+        raw_df = raw_df.iloc[:scan_limit]
+    if raw_df.empty:
+        return raw_df.index[0] if len(raw_df.index) else 0
+
+    # Same row values iterrows() would see
+    values = raw_df.values
+    if values.dtype.kind in "Mm":
+        scores = _score_rows_iter(raw_df)
+    else:
+        values = values.astype(object)
+        scores = np.concatenate([
+            _score_rows(values[start:start + HEADER_SCAN_CHUNK])
+            for start in range(0, len(values), HEADER_SCAN_CHUNK)
+        ])
+
+        # pandas turns all-datetime rows into datetime64 and formats them its
+        # own way, score those few rows exactly as before
+        temporal_rows = _temporal_rows(values)
+        if temporal_rows.any():
+            scores[temporal_rows] = _score_rows_iter(raw_df[temporal_rows])
+
+    # First row with the best score wins ties
+    return raw_df.index[int(np.argmax(scores))]
+
+def normalize_sheet(df):
+    """Clean a dataframe like clean_dataframe and build its SheetColumns in the same pass"""
     # Clean column names
-    df.columns = [clean_identifier(col) for col in df.columns]
+    names = [clean_identifier(col) for col in df.columns]
+    values = [df.iloc[:, i].to_numpy(dtype=object) for i in range(df.shape[1])]
+    null_masks = [pd.isna(col_values) for col_values in values]
     
     # Remove completely empty rows and columns
-    df = df.dropna(how='all').reset_index(drop=True)
-    df = df.dropna(axis=1, how='all')
+    if null_masks:
+        keep_rows = ~np.column_stack(null_masks).all(axis=1)
+    else:
+        keep_rows = np.zeros(len(df), dtype=bool)
     
-    # Convert all values to string and strip whitespace
-    df = df.map(lambda x: str(x).strip() if pd.notna(x) else x)
+    cleaned = {}
+    kept_names = []
+    columns = SheetColumns(int(keep_rows.sum()))
+    for name, col_values, null_mask in zip(names, values, null_masks):
+        col_values = col_values[keep_rows]
+        null_mask = null_mask[keep_rows]
+        if null_mask.all():
+            continue
+        
+        # Convert all values to string and strip whitespace, nulls are kept as is
+        text, lengths = _strip_text(_as_text()(col_values))
+        cleaned[len(kept_names)] = np.where(null_mask, col_values, text)
+        kept_names.append(name)
+        columns.add(
+            name,
+            text,
+            null_mask,
+            len(pd.unique(text[~null_mask])),
+            lengths,
+        )
     
-    return df
+    df = pd.DataFrame(cleaned, index=pd.RangeIndex(columns.length))
+    df.columns = kept_names
+    return df, columns
 
-def generate_rules_from_sheet(df, sheet_name):
-    """Generate exclusion rules from a DataFrame"""
-    key_col = find_key_column(df)
+def clean_dataframe(df):
+    """Clean and normalize dataframe"""
+    return normalize_sheet(df)[0]
+
+def sheet_constraints(df, sheet_name, columns=None):
+    """(keys, options, exclusions) of a DataFrame, None if it has no key column.
+
+    keys holds a (group, option) term for every key value and options one for
+    every option column, whether or not they exclude anything; exclusions
+    holds (key_terms, option_terms) for each column with "N" cells, the rules
+    generate_rules_from_sheet writes out.
+    """
+    if columns is None and not df.columns.has_duplicates:
+        columns = SheetColumns.from_frame(df)
+    key_col = find_key_column(df, columns)
     if not key_col:
         print(f"⚠️ Key column not found in sheet: {sheet_name}")
-        return []
+        return None
     
     # Clean key values
-    key_values = df[key_col].astype(str).str.strip()
-    key_values = key_values[key_values != ""]  # Remove empty values
+    key_values = columns.text[key_col]
+    has_key = key_values != ""  # Remove empty values
+    safe_key_col = clean_identifier(key_col)
+    
+    # Term for each distinct key, built on first use
+    key_terms = {}
+    def key_term(v):
+        if v not in key_terms:
+            key_terms[v] = (safe_key_col, clean_identifier(v))
+        return key_terms[v]
     
-    rules = []
+    options = []
+    exclusions = []
     
     for col in df.columns:
-        if col == key_col or df[col].isna().all():
+        if col == key_col or columns.null_mask[col].all():
             continue  # Skip key column and empty columns
-        
-        # Clean and standardize values
-        col_values = df[col].astype(str).str.strip().str.upper()
+        safe_col = clean_identifier(col)
+        options.append((safe_col, safe_col))
         
         # Find exclusions - only process 'N' values
-        exclusion_mask = col_values == "N"
-        excluded_keys = key_values[exclusion_mask].unique()
+        exclusion_mask = has_key & (columns.upper(col) == "N")
+        excluded_keys = pd.unique(key_values[exclusion_mask])
         
         # Create rule if we have exclusions
         if len(excluded_keys) > 0:
-            # Clean identifiers
-            safe_keys = [clean_identifier(v) for v in excluded_keys if v]
-            safe_col = clean_identifier(col)
-            
-            # Generate rule with dynamic group names
-            key_entries = ", ".join(
-                [f"'{PREFIX}'.'{clean_identifier(key_col)}'.'{v}'" for v in safe_keys]
-            )
-            rule = (
-                f"AnyTrue({key_entries}) "
-                f"Excludes AnyTrue('{PREFIX}'.'{clean_identifier(col)}'.'{safe_col}')"
-            )
-            rules.append(rule)
+            exclusions.append(([key_term(v) for v in excluded_keys if v], [(safe_col, safe_col)]))
+    
+    keys = [key_term(v) for v in pd.unique(key_values[has_key])]
+    return keys, options, exclusions
+
+def generate_rules_from_sheet(df, sheet_name, columns=None):
+    """Generate exclusion rules from a DataFrame, reusing its SheetColumns if given"""
+    constraints = sheet_constraints(df, sheet_name, columns)
+    if constraints is None:
+        return []
+    return [
+        format_rule([format_term(*term) for term in key_terms], [format_term(*term) for term in option_terms])
+        for key_terms, option_terms in constraints[2]
+    ]
+
+def format_term(group, option):
+    return f"'{PREFIX}'.'{group}'.'{option}'"
+
+def format_rule(key_terms, option_terms):
+    return f"AnyTrue({', '.join(key_terms)}) Excludes AnyTrue({', '.join(option_terms)})"
+
+def parse_rule(rule):
+    """(key_terms, option_terms) of a rule written by format_rule, None for any other text"""
+    match = RULE_PATTERN.fullmatch(rule)
+    if match is None:
+        return None
+    return match.group(1).split(", "), match.group(2).split(", ")
+
+def encode_rules(rules):
+    """Rule file bytes, one rule per line ending in ;"""
+    return "\n".join([rule + ";" for rule in rules]).encode("utf-8") if rules else b""
+
+def decode_rules(data):
+    """Rules of a rule file written by encode_rules"""
+    return [line[:-1] for line in data.decode("utf-8").split("\n")] if data else []
+
+def compact_rules(rules):
+    """Merge rules that exclude the same key set into one rule and drop duplicates.
+
+    Rules are grouped by the set of their left-hand terms, so the same keys in
+    another order still share a rule; each group keeps its first left-hand
+    side and the distinct right-hand terms in order of appearance. Returns the
+    compacted rules and {"rules_in", "rules_out", "reduction"}.
+    """
+    groups = {}
+    for rule in rules:
+        parsed = parse_rule(rule)
+        if parsed is None:
+            # Not a rule this module wrote, only drop exact duplicates
+            groups.setdefault(rule, None)
+            continue
+        key_terms, option_terms = parsed
+        group = groups.setdefault(frozenset(key_terms), (key_terms, {}))
+        group[1].update(dict.fromkeys(option_terms))
     
-    return rules
+    compacted = [
+        key if group is None else format_rule(group[0], group[1])
+        for key, group in groups.items()
+    ]
+    return compacted, {
+        "rules_in": len(rules),
+        "rules_out": len(compacted),
+        "reduction": 1 - len(compacted) / len(rules) if rules else 0.0,
+    }
 
+def compaction_stats(stats):
+    """Combine the compact_rules counters of several rule files"""
+    rules_in = sum(s["rules_in"] for s in stats)
+    rules_out = sum(s["rules_out"] for s in stats)
+    return {
+        "rules_in": rules_in,
+        "rules_out": rules_out,
+        "reduction": 1 - rules_out / rules_in if rules_in else 0.0,
+    }
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import re
+import uuid
+import zipfile
+from .generateRules import PREFIX, encode_rules
+from .resultCache import file_digest
+from .ruleRunner import generate_sheet_rules_for_workbooks
+from .sheetReaders import list_sheet_parts
+
+# Configuration
+MANIFEST_FOLDER = os.getenv("RULE_MANIFEST_DIR", "rule_manifests")
+
+# Shared string entries and the cells that reference them, matched on the raw XML
+SHARED_STRING = re.compile(rb"<(?:\w+:)?si\b.*?</(?:\w+:)?si>", re.S)
+SHARED_REF = re.compile(rb'<(?:\w+:)?c\b[^>]*?\bt="s"[^>]*>\s*<(?:\w+:)?v>\s*(\d+)\s*<')
+DATE_1904 = re.compile(rb'\bdate1904="(?:1|true)"')
+
+def sheet_digests(excel_path):
+    """[(sheet_name, sha256)] of each worksheet of an xlsx file, None if it can't be split by sheet.
+
+    A sheet's digest covers its own XML, the shared strings it references and
+    what every sheet depends on (styles and the 1904 date flag), so editing
+    one sheet leaves the digests of the others unchanged.
+    """
+    sheet_parts = list_sheet_parts(excel_path)
+    if not sheet_parts:
+        return None
+    try:
+        with zipfile.ZipFile(excel_path) as archive:
+            names = set(archive.namelist())
+            shared = []
+            if "xl/sharedStrings.xml" in names:
+                shared = SHARED_STRING.findall(archive.read("xl/sharedStrings.xml"))
+            common = hashlib.sha256()
+            if "xl/styles.xml" in names:
+                common.update(archive.read("xl/styles.xml"))
+            common.update(b"1904" if DATE_1904.search(archive.read("xl/workbook.xml")) else b"1900")
+
+            digests = []
+            for sheet_name, part in sheet_parts:
+                xml = archive.read(part)
+                digest = common.copy()
+                digest.update(xml)
+                for index in SHARED_REF.findall(xml):
+                    digest.update(b"\0" + shared[int(index)])
+                digests.append((sheet_name, digest.hexdigest()))
+            return digests
+    except (zipfile.BadZipFile, KeyError, IndexError):
+        return None
+
+def manifest_path(excel_files_path):
+    """Manifest file of a rules directory"""
+    key = hashlib.sha256(os.path.abspath(excel_files_path).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(MANIFEST_FOLDER, f"{key}.json")
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+    if not isinstance(manifest.get("files"), dict):
+        return {"files": {}}
+    return manifest
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+def incremental_rule_results(excel_paths, cache, workers=None, header_scan_limit=None, progress=None, manifest_file=None, reader=None):
+    """Yield (excel_path, rule file bytes) for each workbook in order, re-running only changed sheets.
+
+    The manifest records each file's mtime, size and sha256 plus the digest
+    of each sheet, so unchanged files are not even re-hashed. Rules are
+    looked up in cache per workbook and then per sheet; only sheets with no
+    cached rules are parsed, and the cached rules of the others are spliced
+    in sheet order. Sheets that fail to parse are left out of the rules and
+    not cached, nor is their workbook, so the next run parses them again.
+    Bytes are None if the workbook could not be opened.
+    """
+    manifest = load_manifest(manifest_file) if manifest_file else {"files": {}}
+    seen = {}
+    if progress:
+        progress(files_total=len(excel_paths))
+
+    # Work out what is already cached before starting any parsing
+    plans = []
+    for excel_path in excel_paths:
+        excel_file = os.path.basename(excel_path)
+        stat = os.stat(excel_path)
+        entry = manifest["files"].get(excel_file)
+        if not (entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size):
+            entry = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": file_digest(excel_path), "sheets": None}
+
+        file_key = cache.key("rules", entry["sha256"], PREFIX, header_scan_limit, reader)
+        hit = cache.get(file_key)
+        if hit is not None:
+            plans.append((excel_path, entry, file_key, hit[0], None, None))
+            continue
+
+        if entry["sheets"] is None:
+            digests = sheet_digests(excel_path)
+            entry["sheets"] = [{"name": name, "sha256": digest} for name, digest in digests] if digests else []
+
+        cached_sheets = {}
+        for sheet in entry["sheets"]:
+            sheet_hit = cache.get(cache.key("sheet-rules", sheet["sha256"], PREFIX, header_scan_limit, reader))
+            if sheet_hit is not None:
+                cached_sheets[sheet["name"]] = json.loads(sheet_hit[0])
+        if entry["sheets"]:
+            changed = [sheet["name"] for sheet in entry["sheets"] if sheet["name"] not in cached_sheets]
+        else:
+            changed = None  # not split by sheet, parse the whole workbook
+        plans.append((excel_path, entry, file_key, None, cached_sheets, changed))
+
+    def report(**info):
+        # files_total above already counts the workbooks that need no parsing
+        info.pop("files_total", None)
+        if progress and info:
+            progress(**info)
+
+    todo = [(plan[0], plan[5]) for plan in plans if plan[3] is None and plan[5] != []]
+    results = generate_sheet_rules_for_workbooks(todo, workers, header_scan_limit, report, reader)
+
+    try:
+        for excel_path, entry, file_key, data, cached_sheets, changed in plans:
+            excel_file = os.path.basename(excel_path)
+            if data is not None:
+                print(f"\n♻️ Using cached rules for {excel_file}")
+                report(file=excel_file)
+            else:
+                if changed == []:
+                    print(f"\n♻️ Using cached rules for every sheet of {excel_file}")
+                    report(file=excel_file)
+                    fresh = []
+                else:
+                    _, fresh = next(results)
+                    # Workbook could not be opened, leave it out of the manifest so it is retried
+                    if fresh is None:
+                        yield excel_path, None
+                        continue
+
+                sheet_rules = dict(fresh)
+                failed = [name for name, rules in fresh if rules is None]
+                for sheet in entry["sheets"]:
+                    if sheet["name"] in failed:
+                        continue
+                    if sheet["name"] in sheet_rules:
+                        rules = sheet_rules[sheet["name"]]
+                        cache.put(cache.key("sheet-rules", sheet["sha256"], PREFIX, header_scan_limit, reader), json.dumps(rules).encode("utf-8"), {"rules": len(rules)})
+                    else:
+                        print(f"  - Sheet: {sheet['name']} ♻️ cached")
+
+                if entry["sheets"]:
+                    all_rules = [
+                        rule for sheet in entry["sheets"]
+                        for rule in sheet_rules.get(sheet["name"], cached_sheets.get(sheet["name"])) or []
+                    ]
+                else:
+                    all_rules = [rule for _, rules in fresh for rule in rules or []]
+                data = encode_rules(all_rules)
+                if not failed:
+                    cache.put(file_key, data, {"rules": len(all_rules)})
+
+            seen[excel_file] = entry
+            yield excel_path, data
+    finally:
+        if manifest_file:
+            # Only files seen in this run are kept, so deleted files drop out
+            save_manifest(manifest_file, {"files": seen})
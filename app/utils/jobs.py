@@ -0,0 +1,255 @@
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import traceback
+import uuid
+
+# Configuration
+JOB_FOLDER = os.getenv("JOB_FOLDER", "jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "16"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))  # seconds a finished job is kept
+SWEEP_INTERVAL = 30  # seconds an idle worker waits before expiring old jobs
+HEARTBEAT_INTERVAL = 10  # seconds between touches of the status files of a process's unfinished jobs
+STATUS_NAME = "job.json"
+
+def _is_job_id(job_id):
+    return len(job_id) == 32 and all(c in "0123456789abcdef" for c in job_id)
+
+class Job:
+    """One queued extract/generate run with its own workspace directory.
+
+    Its state is written to job.json in the workspace whenever it changes, so
+    any server process sharing JOB_FOLDER can report on it and serve its result.
+    """
+
+    def __init__(self, kind, func, root):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.workspace = os.path.join(root, self.id)
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result_path = None
+        self.headers = {}
+        self.message = None
+        self.error = None
+        self.progress = {
+            "files_total": None,
+            "files_done": 0,
+            "sheets_total": None,
+            "sheets_done": 0,
+            "current_file": None,
+            "current_sheet": None,
+        }
+        self._lock = threading.Lock()
+
+    def report(self, file=None, sheet=None, **totals):
+        """Progress callback: sheet finished (file+sheet), file finished (file) or new totals"""
+        with self._lock:
+            self.progress.update(totals)
+            if file is not None:
+                self.progress["current_file"] = file
+            if sheet is not None:
+                self.progress["sheets_done"] += 1
+                self.progress["current_sheet"] = sheet
+            elif file is not None:
+                self.progress["files_done"] += 1
+        self.save()
+
+    def expires_at(self, ttl):
+        return self.finished_at + ttl if self.finished_at else None
+
+    def save(self):
+        """Write the job's state to its status file, through a temp file so readers never see a partial one"""
+        with self._lock:
+            state = {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "result_path": self.result_path,
+                "headers": self.headers,
+                "message": self.message,
+                "error": self.error,
+                "progress": self.progress,
+            }
+            path = os.path.join(self.workspace, STATUS_NAME)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, root, job_id):
+        """Job as last saved under root by any process, or None if there is no readable status file"""
+        workspace = os.path.join(root, job_id)
+        try:
+            with open(os.path.join(workspace, STATUS_NAME)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls(state.pop("kind"), None, root)
+        job.__dict__.update(state)
+        job.workspace = workspace
+        return job
+
+    def to_dict(self, ttl):
+        with self._lock:
+            progress = dict(self.progress)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": progress,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at(ttl),
+        }
+
+class JobManager:
+    """Bounded queue of jobs run by a fixed number of worker threads.
+
+    A job's func is called with the Job and returns the path of its result
+    file (or None), writing anything it needs under job.workspace. Jobs are
+    looked up through their status files, so with several server processes
+    sharing root any of them can answer for a job another one runs; the
+    queue and worker threads are per process. Finished jobs are removed ttl
+    seconds after they finish. The process holding a queued or running job
+    touches its status file every heartbeat seconds, so it is only removed
+    once that stops (the process is gone) for ttl seconds.
+    """
+
+    def __init__(self, root=JOB_FOLDER, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE, ttl=JOB_RESULT_TTL, heartbeat=HEARTBEAT_INTERVAL):
+        self.root = root
+        self.workers = workers
+        self.ttl = ttl
+        self.heartbeat = heartbeat
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        # Threads are started on first use, not at import time
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind, func):
+        """Queue a job, raises queue.Full when the queue is at capacity"""
+        self._start()
+        self.sweep()
+        job = Job(kind, func, self.root)
+        # Saved before a worker can pick it up, so the queued state never overwrites a later one
+        os.makedirs(job.workspace, exist_ok=True)
+        job.save()
+        try:
+            with self._lock:
+                self._queue.put_nowait(job)
+                self._jobs[job.id] = job
+        except queue.Full:
+            shutil.rmtree(job.workspace, ignore_errors=True)
+            raise
+        return job
+
+    def get(self, job_id):
+        """The job, from this process if it runs it, else from its status file"""
+        self.sweep()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and _is_job_id(job_id):
+            job = Job.load(self.root, job_id)
+        return job
+
+    def sweep(self):
+        """Remove the workspaces under root of expired jobs, see _expired.
+
+        Covers jobs of every process sharing root, including ones left behind by
+        a process that stopped; jobs this process still runs are kept.
+        """
+        now = time.time()
+        with self._lock:
+            active = {job.id for job in self._jobs.values() if not job.finished_at}
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at and job.expires_at(self.ttl) <= now
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            workspace = os.path.join(self.root, name)
+            if name not in active and os.path.isdir(workspace) and self._expired(name, now):
+                shutil.rmtree(workspace, ignore_errors=True)
+
+    def _expired(self, name, now):
+        """A finished job ttl seconds after it finished, an unfinished one once its heartbeat stopped ttl seconds ago"""
+        job = Job.load(self.root, name)
+        if job is not None and job.finished_at:
+            return job.expires_at(self.ttl) <= now
+        workspace = os.path.join(self.root, name)
+        status_path = os.path.join(workspace, STATUS_NAME)
+        try:
+            beat = os.path.getmtime(status_path if job is not None else workspace)
+        except OSError:
+            return False
+        return beat + max(self.ttl, 3 * self.heartbeat) <= now
+
+    def _beat(self):
+        while True:
+            time.sleep(self.heartbeat)
+            with self._lock:
+                unfinished = [job for job in self._jobs.values() if not job.finished_at]
+            for job in unfinished:
+                try:
+                    os.utime(os.path.join(job.workspace, STATUS_NAME))
+                except OSError:
+                    pass
+
+    def _work(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=SWEEP_INTERVAL)
+            except queue.Empty:
+                self.sweep()
+                continue
+
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                os.makedirs(job.workspace, exist_ok=True)
+                job.save()
+                job.result_path = job.func(job)
+                job.status = "done"
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                try:
+                    job.save()
+                except OSError:
+                    traceback.print_exc()
+                self._queue.task_done()
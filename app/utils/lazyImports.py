@@ -0,0 +1,40 @@
+import importlib
+
+# name -> LazyModule, everything warm_up() imports
+LAZY_MODULES = {}
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    Keeps pandas, numpy and openpyxl out of the app's import, so a new worker
+    starts serving before they are loaded. On first use the module's
+    attributes are copied onto the stand-in, so later lookups are plain
+    attribute reads.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+
+    def __load(self):
+        module = importlib.import_module(self.__name)
+        self.__dict__.update(module.__dict__)
+        return module
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not copied yet, such as submodules imported later
+        return getattr(self.__load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module {self.__name!r}>"
+
+def lazy_module(name):
+    """LazyModule for name, shared by every module that asks for it"""
+    if name not in LAZY_MODULES:
+        LAZY_MODULES[name] = LazyModule(name)
+    return LAZY_MODULES[name]
+
+def warm_up():
+    """Import every lazy module now, returns their names"""
+    for module in LAZY_MODULES.values():
+        module._LazyModule__load()
+    return list(LAZY_MODULES)
@@ -0,0 +1,195 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"  # 0 turns every stage/count call into a no-op
+METRIC_PREFIX = "configurator"
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+HELP = {
+    "stage_seconds": "Time spent in each pipeline stage",
+    "sheets_processed_total": "Sheets run through rule generation",
+    "rules_emitted_total": "Rules generated",
+    "tables_extracted_total": "Table blocks extracted",
+    "bytes_read_total": "Bytes of workbooks opened",
+    "errors_total": "Workbooks or sheets that failed, by stage",
+}
+
+class Registry:
+    """Process-wide counters and histograms, rendered in Prometheus text format"""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, labels=()):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def observe(self, name, value, labels=()):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += value
+
+    def render(self):
+        def label_text(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}_{name}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{label_text(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            metric = f"{METRIC_PREFIX}_{name}"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, bucket_count in zip(self.buckets, histogram):
+                lines.append(f"{metric}_bucket{label_text(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{metric}_bucket{label_text(labels, [('le', '+Inf')])} {histogram[-2]}")
+            lines.append(f"{metric}_sum{label_text(labels)} {histogram[-1]}")
+            lines.append(f"{metric}_count{label_text(labels)} {histogram[-2]}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class StageTimer:
+    """Stage totals of one request, overall and per (file, sheet)"""
+
+    def __init__(self):
+        self.stages = {}
+        self.sheets = {}
+
+    def add(self, stage, seconds, file=None, sheet=None):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        if file is not None or sheet is not None:
+            sheet_stages = self.sheets.setdefault((file, sheet), {})
+            sheet_stages[stage] = sheet_stages.get(stage, 0.0) + seconds
+
+    def server_timing(self):
+        """Server-Timing header value, durations in milliseconds"""
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items())
+
+    def print_slowest(self, n=3):
+        slowest = sorted(self.sheets.items(), key=lambda item: sum(item[1].values()), reverse=True)[:n]
+        for (file, sheet), stages in slowest:
+            breakdown = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stages.items())
+            print(f"⏱️ {file} / {sheet}: {sum(stages.values()):.2f}s ({breakdown})")
+
+_timer = contextvars.ContextVar("stage_timer", default=None)
+_events = contextvars.ContextVar("metric_events", default=None)
+
+def observe_stage(stage, seconds, file=None, sheet=None):
+    """Record seconds spent in a stage, tagged with the file and sheet it was for"""
+    events = _events.get()
+    if events is not None:
+        events.append(("stage", stage, seconds, file, sheet))
+        return
+    REGISTRY.observe("stage_seconds", seconds, (("stage", stage),))
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(stage, seconds, file, sheet)
+
+class _Stage:
+    __slots__ = ("name", "file", "sheet", "start")
+
+    def __init__(self, name, file, sheet):
+        self.name = name
+        self.file = file
+        self.sheet = sheet
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.name, time.perf_counter() - self.start, self.file, self.sheet)
+
+_NO_STAGE = nullcontext()
+
+def stage(name, file=None, sheet=None):
+    """Context manager timing one stage, a shared no-op when metrics are disabled"""
+    if not METRICS_ENABLED:
+        return _NO_STAGE
+    return _Stage(name, file, sheet)
+
+_DONE = object()
+
+def _timed(iterable, name, file, sheet):
+    iterator = iter(iterable)
+    while True:
+        with _Stage(name, file, sheet):
+            item = next(iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+def timed(iterable, name, file=None, sheet=None):
+    """Iterate, adding the time spent producing each item (not consuming it) to a stage"""
+    if not METRICS_ENABLED:
+        return iterable
+    return _timed(iterable, name, file, sheet)
+
+def count(name, value=1, **labels):
+    """Add to a counter, name without the prefix (e.g. rules_emitted_total)"""
+    if not METRICS_ENABLED:
+        return
+    events = _events.get()
+    if events is not None:
+        events.append(("count", name, value, labels))
+        return
+    REGISTRY.inc(name, value, tuple(sorted(labels.items())))
+
+@contextmanager
+def timing(timer):
+    """Add every stage recorded in this context to timer"""
+    token = _timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _timer.reset(token)
+
+@contextmanager
+def capture():
+    """Collect stage and counter events instead of recording them, to hand back from a worker process"""
+    events = []
+    token = _events.set(events)
+    try:
+        yield events
+    finally:
+        _events.reset(token)
+
+def replay(events):
+    """Record events collected by capture() in this process"""
+    for event in events:
+        if event[0] == "stage":
+            observe_stage(*event[1:])
+        else:
+            count(event[1], event[2], **event[3])
+
+def render_metrics():
+    return REGISTRY.render()
@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Configuration
+# Forking a server that is running threads can copy a lock another thread holds into the child,
+# so pool workers are started from a clean forkserver process (or spawned) instead
+POOL_START_METHOD = os.getenv(
+    "POOL_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn",
+)
+# Imported once by the forkserver, so its workers start with them already loaded
+POOL_PRELOAD = ["pandas", "numpy", "openpyxl", "app.utils.ruleRunner", "app.utils.batchExtract"]
+
+def pool_context():
+    """multiprocessing context the pools start their workers with"""
+    context = multiprocessing.get_context(POOL_START_METHOD)
+    if POOL_START_METHOD == "forkserver":
+        # Only read when the forkserver starts, later calls are no-ops
+        context.set_forkserver_preload(POOL_PRELOAD)
+    return context
+
+def process_pool(workers):
+    """ProcessPoolExecutor of at most workers processes, started with pool_context()"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=pool_context())
@@ -0,0 +1,71 @@
+import json
+import os
+
+# Configuration
+JOURNAL_NAME = "progress.jsonl"
+
+def file_signature(path):
+    """Size and mtime of a file, a journal entry only counts while they match"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+class ProgressJournal:
+    """Append-only log of the workbooks a batch run has finished, read back to resume it.
+
+    One JSON line per workbook, flushed to disk as soon as it finishes, so an
+    interrupted run only loses the workbooks that were in flight. Entries
+    written with other settings are ignored, as is a line torn by a crash.
+    """
+
+    def __init__(self, path, settings, restart=False):
+        self.path = path
+        self.settings = settings
+        self._entries = {}  # workbook -> latest entry
+        if restart:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            self._load()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(path, "a+b")
+        self._f.seek(0, os.SEEK_END)
+        if self._f.tell():
+            self._f.seek(-1, os.SEEK_END)
+            if self._f.read(1) != b"\n":
+                # Start after a torn line instead of appending to it
+                self._f.write(b"\n")
+
+    def _load(self):
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get("settings") == self.settings:
+                    self._entries[entry["workbook"]] = entry
+
+    def is_done(self, workbook, signature):
+        """True if workbook finished without an error and hasn't changed since"""
+        entry = self._entries.get(workbook)
+        return entry is not None and entry.get("error") is None and entry.get("signature") == signature
+
+    def record(self, workbook, signature, error=None, **result):
+        entry = {"workbook": workbook, "signature": signature, "settings": self.settings, "error": error, **result}
+        self._entries[workbook] = entry
+        self._f.write(json.dumps(entry).encode("utf-8") + b"\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
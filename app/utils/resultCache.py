@@ -0,0 +1,213 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import uuid
+from importlib import metadata
+from .uploads import UploadedWorkbook, WorkbookBuffer
+
+# Configuration
+CACHE_FOLDER = os.getenv("RESULT_CACHE_DIR", "result_cache")
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # 0 disables the cache
+
+def _code_version():
+    """Hash of the utils sources and parser library versions, part of every key"""
+    digest = hashlib.sha256()
+    utils_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(utils_dir, "*.py"))):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    for package in ("openpyxl", "pandas", "numpy"):
+        try:
+            digest.update(f"{package}=={metadata.version(package)}".encode())
+        except metadata.PackageNotFoundError:
+            pass
+    return digest.hexdigest()[:16]
+
+CODE_VERSION = _code_version()
+
+def file_digest(path):
+    """sha256 of a file's bytes, or of an uploaded WorkbookBuffer or UploadedWorkbook"""
+    if isinstance(path, WorkbookBuffer):
+        return hashlib.sha256(path.getbuffer()).hexdigest()
+    digest = hashlib.sha256()
+    if isinstance(path, UploadedWorkbook):
+        path.seek(0)
+        for block in iter(lambda: path.read(1024 * 1024), b""):
+            digest.update(block)
+        path.seek(0)
+        return digest.hexdigest()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_file(f, chunk_size=64 * 1024):
+    """Yield an open binary file in chunks, closing it at the end"""
+    with f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+class ResultCache:
+    """On-disk cache of finished results, keyed by content hash and request parameters.
+
+    Each entry is <key>.bin with the result bytes plus <key>.json with its
+    metadata. Reads touch the entry, and writes evict the least recently
+    used entries once the cache grows past max_bytes. Hit/miss counters are
+    per process.
+    """
+
+    def __init__(self, root=CACHE_FOLDER, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key(self, *parts):
+        """Cache key for a result kind, content digest(s) and request parameters"""
+        payload = json.dumps([CODE_VERSION, *parts], default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        data_path = os.path.join(self.root, f"{key}.bin")
+        return data_path, data_path[:-len(".bin")] + ".json"
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def open(self, key):
+        """Return (open binary file, metadata) for a cached result, or None"""
+        if not self.enabled:
+            return None
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            data = open(data_path, "rb")
+        except (OSError, ValueError):
+            self._count(False)
+            return None
+        try:
+            os.utime(data_path)  # mark as recently used
+        except OSError:
+            pass
+        self._count(True)
+        return data, meta
+
+    def get(self, key):
+        """Return (bytes, metadata) for a cached result, or None"""
+        opened = self.open(key)
+        if opened is None:
+            return None
+        data, meta = opened
+        with data:
+            return data.read(), meta
+
+    def _commit(self, key, tmp_path, meta):
+        data_path, meta_path = self._paths(key)
+        meta_tmp = f"{tmp_path}.json"
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(meta or {}, f)
+        # Metadata first: a .bin without its .json is never served
+        os.replace(meta_tmp, meta_path)
+        os.replace(tmp_path, data_path)
+        self.evict()
+
+    def _tmp_path(self):
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, f"tmp_{uuid.uuid4().hex}")
+
+    def put(self, key, data, meta=None):
+        if not self.enabled:
+            return
+        tmp_path = self._tmp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self._commit(key, tmp_path, meta)
+
+    def store_stream(self, key, chunks, meta=None):
+        """Pass chunks through while writing them to the cache.
+
+        The entry is only stored if the stream is consumed to the end; meta
+        may be a callable evaluated at that point.
+        """
+        if not self.enabled:
+            yield from chunks
+            return
+        tmp_path = self._tmp_path()
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            self._commit(key, tmp_path, meta() if callable(meta) else meta)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _entries(self):
+        """(path, size, last use) of every stored result"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".bin"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _remove(self, data_path):
+        for path in (data_path, data_path[:-len(".bin")] + ".json"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for data_path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(data_path)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def purge(self):
+        """Remove every cached result, returns how many were removed"""
+        entries = self._entries()
+        for data_path, _, _ in entries:
+            self._remove(data_path)
+        return len(entries)
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "code_version": CODE_VERSION,
+            }
@@ -0,0 +1,178 @@
+import os
+from .generateRules import (
+    find_header_row,
+    generate_rules_from_sheet,
+    normalize_sheet,
+    frame_from_grid,
+    sheet_constraints,
+)
+from .metrics import capture, count, replay, stage
+from .processPools import process_pool
+from .sheetReaders import list_sheet_names, open_reader
+from .uploads import source_name, source_size
+
+# Configuration
+RULE_WORKERS = int(os.getenv("RULE_WORKERS", "1"))
+SPLIT_WORKBOOK_BYTES = int(os.getenv("SPLIT_WORKBOOK_BYTES", str(5 * 1024 * 1024)))  # split larger files by sheet
+
+def process_sheet(book, sheet_name, header_scan_limit=None, excel_file=None, constraints=False):
+    """Parse one sheet of an open reader and return its rules, [] if it is empty or None if it fails.
+
+    With constraints=True returns its sheet_constraints instead, None if it is empty or fails.
+    """
+    print(f"  - Sheet: {sheet_name}")
+    try:
+        # Parse the sheet once, both frames are built from this grid
+        with stage("parse", excel_file, sheet_name):
+            grid = book.read_grid(sheet_name)
+            raw_df = frame_from_grid(grid)
+        
+        # Find best header row
+        with stage("header", excel_file, sheet_name):
+            header_row_idx = find_header_row(raw_df, scan_limit=header_scan_limit)
+        
+        # Rebuild with detected header, then clean and normalize data, keeping the per-column views
+        with stage("clean", excel_file, sheet_name):
+            df = frame_from_grid(grid, header=header_row_idx)
+            df, columns = normalize_sheet(df)
+        count("sheets_processed_total")
+        
+        # Skip empty sheets
+        if df.empty:
+            print("    ⚠️ Empty sheet, skipping")
+            return None if constraints else []
+        
+        if constraints:
+            with stage("rules", excel_file, sheet_name):
+                return sheet_constraints(df, sheet_name, columns)
+        
+        # Generate rules from this sheet
+        with stage("rules", excel_file, sheet_name):
+            sheet_rules = generate_rules_from_sheet(df, sheet_name, columns)
+        count("rules_emitted_total", len(sheet_rules))
+        print(f"    ✅ Generated {len(sheet_rules)} rules")
+        return sheet_rules
+        
+    except Exception as e:
+        count("errors_total", stage="sheet")
+        print(f"    ⚠️ Error processing sheet: {str(e)}")
+        return None
+
+def process_workbook_sheets(excel_path, sheet_names=None, header_scan_limit=None, progress=None, reader=None, constraints=False):
+    """[(sheet_name, rules)] for the given sheets (all by default) in sheet order, None if the file can't be opened.
+
+    rules is None for a sheet that failed, so callers can tell it from one without rules.
+    With constraints=True each sheet comes with its sheet_constraints instead of rules.
+    """
+    excel_file = source_name(excel_path)
+    try:
+        with stage("open", excel_file):
+            book = open_reader(excel_path, reader)
+    except Exception as e:
+        count("errors_total", stage="open")
+        print(f"❌ Could not open {excel_file}: {e}")
+        return None
+    count("bytes_read_total", source_size(excel_path))
+    
+    with book:
+        if sheet_names is None:
+            sheet_names = book.sheet_names
+        
+        sheet_rules = []
+        for sheet_name in sheet_names:
+            sheet_rules.append((sheet_name, process_sheet(book, sheet_name, header_scan_limit, excel_file, constraints)))
+            if progress:
+                progress(file=source_name(excel_path), sheet=sheet_name)
+        return sheet_rules
+
+def _pooled_workbook_sheets(*args):
+    """process_workbook_sheets in a pool worker, returns its result and the metric events it recorded"""
+    with capture() as events:
+        result = process_workbook_sheets(*args)
+    return result, events
+
+def process_workbook(excel_path, sheet_names=None, header_scan_limit=None, progress=None, reader=None):
+    """Rules of the given sheets (all by default) in sheet order, None if the file can't be opened"""
+    sheet_rules = process_workbook_sheets(excel_path, sheet_names, header_scan_limit, progress, reader)
+    if sheet_rules is None:
+        return None
+    return [rule for _, rules in sheet_rules for rule in rules or []]
+
+def generate_sheet_rules_for_workbooks(workbooks, workers=None, header_scan_limit=None, progress=None, reader=None, constraints=False):
+    """Yield (excel_path, [(sheet_name, rules)]) for each (excel_path, sheet_names) pair, in the order given.
+
+    sheet_names=None means every sheet of the workbook. With more than one
+    worker, workbooks are processed in a process pool and workbooks of
+    SPLIT_WORKBOOK_BYTES or more are split into one task per sheet. Results
+    are collected in input order, so rule files come out the same as a
+    serial run. The sheet list is None if the workbook could not be opened.
+
+    progress, if given, is called in this process with file=/sheet= as sheets
+    finish and with file= alone as workbooks finish. Sheets of workbooks
+    handed to the pool whole are not reported one by one. reader picks the
+    sheetReaders backend, SHEET_READER by default. Metrics recorded in pool
+    workers are replayed here as each workbook's results are collected. With
+    constraints=True sheets come with their sheet_constraints instead of rules.
+    """
+    workbooks = list(workbooks)
+    workers = workers or RULE_WORKERS
+    if progress:
+        progress(files_total=len(workbooks))
+    
+    if workers <= 1:
+        for excel_path, sheet_names in workbooks:
+            print(f"\nProcessing file: {source_name(excel_path)}")
+            sheet_rules = process_workbook_sheets(excel_path, sheet_names, header_scan_limit, progress, reader, constraints)
+            if progress:
+                progress(file=source_name(excel_path))
+            yield excel_path, sheet_rules
+        return
+    
+    with process_pool(workers) as pool:
+        tasks = []
+        for excel_path, sheet_names in workbooks:
+            print(f"\nQueued file: {source_name(excel_path)}")
+            split_names = None
+            if source_size(excel_path) >= SPLIT_WORKBOOK_BYTES:
+                split_names = sheet_names if sheet_names is not None else list_sheet_names(excel_path)
+            
+            if split_names:
+                futures = [
+                    pool.submit(_pooled_workbook_sheets, excel_path, [sheet_name], header_scan_limit, None, reader, constraints)
+                    for sheet_name in split_names
+                ]
+                if progress:
+                    for future, sheet_name in zip(futures, split_names):
+                        future.add_done_callback(
+                            lambda _, f=source_name(excel_path), s=sheet_name: progress(file=f, sheet=s)
+                        )
+            else:
+                futures = [pool.submit(_pooled_workbook_sheets, excel_path, sheet_names, header_scan_limit, None, reader, constraints)]
+            tasks.append((excel_path, futures))
+        
+        for excel_path, futures in tasks:
+            results = []
+            for future in futures:
+                result, events = future.result()
+                # Stages and counters of the worker are recorded here, under this request's timer
+                replay(events)
+                results.append(result)
+            if progress:
+                progress(file=source_name(excel_path))
+            if any(result is None for result in results):
+                yield excel_path, None
+            else:
+                yield excel_path, [entry for result in results for entry in result]
+
+def generate_rules_for_workbooks(excel_paths, workers=None, header_scan_limit=None, progress=None, reader=None):
+    """Yield (excel_path, rules) for each workbook, in the order given.
+
+    See generate_sheet_rules_for_workbooks; rules is None if the workbook
+    could not be opened.
+    """
+    workbooks = [(excel_path, None) for excel_path in excel_paths]
+    for excel_path, sheet_rules in generate_sheet_rules_for_workbooks(workbooks, workers, header_scan_limit, progress, reader):
+        if sheet_rules is None:
+            yield excel_path, None
+        else:
+            yield excel_path, [rule for _, rules in sheet_rules for rule in rules or []]
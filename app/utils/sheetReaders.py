@@ -0,0 +1,310 @@
+import os
+import posixpath
+import zipfile
+from importlib.util import find_spec
+from xml.etree import ElementTree
+from .generateRules import read_sheet_grid
+from .lazyImports import lazy_module
+from .uploads import source_name
+
+np = lazy_module("numpy")
+pd = lazy_module("pandas")
+openpyxl = lazy_module("openpyxl")
+xl_strings = lazy_module("openpyxl.reader.strings")
+xl_stylesheet = lazy_module("openpyxl.styles.stylesheet")
+xl_cell = lazy_module("openpyxl.utils.cell")
+xl_datetime = lazy_module("openpyxl.utils.datetime")
+xl_text = lazy_module("openpyxl.cell.text")
+
+# Configuration
+SHEET_READER = os.getenv("SHEET_READER", "openpyxl")  # default reader for rule generation
+
+SHEET_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+SHARED_STRINGS_TYPE = "/sharedStrings"
+
+def list_sheet_parts(excel_path):
+    """(name, zip member) of each worksheet of an xlsx file in workbook order, read without loading the workbook"""
+    try:
+        with zipfile.ZipFile(excel_path) as archive:
+            workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+            rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        return None
+
+    # Chartsheets are listed too, pandas only reads worksheets
+    worksheet_targets = {
+        rel.get("Id"): rel.get("Target", "")
+        for rel in rels if rel.get("Type", "").endswith("/worksheet")
+    }
+    sheet_parts = []
+    for sheet in workbook.iter():
+        if not sheet.tag.endswith("}sheet"):
+            continue
+        rel_id = next((v for k, v in sheet.attrib.items() if k.endswith("}id")), None)
+        if rel_id in worksheet_targets:
+            sheet_parts.append((sheet.get("name"), _part_path(worksheet_targets[rel_id])))
+    return sheet_parts or None
+
+def list_sheet_names(excel_path):
+    """Worksheet names of an xlsx file in workbook order, read without loading the workbook"""
+    sheet_parts = list_sheet_parts(excel_path)
+    return [name for name, _ in sheet_parts] if sheet_parts else None
+
+def _part_path(target):
+    # Targets are relative to xl/ unless absolute within the package
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+def trim_sheet_rows(rows):
+    """Trim trailing empty cells and rows, then pad to a rectangle, as pandas' Excel readers do"""
+    data = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(rows):
+        while row and row[-1] == "":
+            row.pop()
+        if row:
+            last_row_with_data = row_number
+        data.append(row)
+    data = data[: last_row_with_data + 1]
+
+    if data:
+        max_width = max(len(row) for row in data)
+        for row in data:
+            if len(row) < max_width:
+                row.extend([""] * (max_width - len(row)))
+    return data
+
+def iter_sheet_rows(ws, streaming=False):
+    """Yield the rows of a worksheet, padded to the sheet width"""
+    if streaming and ws.max_column is None:
+        # Sheet has no <dimension> record, size it with an extra streaming pass
+        ws.reset_dimensions()
+        ws.calculate_dimension(force=True)
+    return ws.iter_rows()
+
+class PandasReader:
+    """Sheets read through pd.read_excel with the given engine"""
+
+    def __init__(self, excel_path, engine=None):
+        self.xls = pd.ExcelFile(excel_path, engine=engine)
+
+    @property
+    def sheet_names(self):
+        return self.xls.sheet_names
+
+    def read_grid(self, sheet_name):
+        return read_sheet_grid(self.xls, sheet_name)
+
+    def close(self):
+        self.xls.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class XmlReader:
+    """Values-only xlsx reader that parses the sheet XML directly.
+
+    Gives the same grid as pandas' openpyxl reader (data_only, read-only
+    mode) without building openpyxl cell objects: shared strings, the 1904
+    epoch and date/timedelta number formats are resolved the same way, errors
+    become NaN and integral numbers become int.
+    """
+
+    def __init__(self, excel_path):
+        self.archive = zipfile.ZipFile(excel_path)
+        try:
+            self._sheet_parts = dict(list_sheet_parts(excel_path) or [])
+            workbook = ElementTree.fromstring(self.archive.read("xl/workbook.xml"))
+            rels = ElementTree.fromstring(self.archive.read("xl/_rels/workbook.xml.rels"))
+        except Exception:
+            self.archive.close()
+            raise
+        self.sheet_names = list(self._sheet_parts)
+
+        self.epoch = xl_datetime.CALENDAR_WINDOWS_1900
+        for element in workbook.iter():
+            if element.tag.endswith("}workbookPr") and element.get("date1904", "").lower() in ("1", "true"):
+                self.epoch = xl_datetime.CALENDAR_MAC_1904
+
+        strings_part = next(
+            (_part_path(rel.get("Target", "")) for rel in rels if rel.get("Type", "").endswith(SHARED_STRINGS_TYPE)),
+            "xl/sharedStrings.xml"
+        )
+        names = set(self.archive.namelist())
+        self.shared_strings = []
+        if strings_part in names:
+            with self.archive.open(strings_part) as src:
+                self.shared_strings = xl_strings.read_string_table(src)
+
+        self.date_formats = self.timedelta_formats = set()
+        if "xl/styles.xml" in names:
+            stylesheet = xl_stylesheet.Stylesheet.from_tree(ElementTree.fromstring(self.archive.read("xl/styles.xml")))
+            self.date_formats = stylesheet.date_formats
+            self.timedelta_formats = stylesheet.timedelta_formats
+
+    def _cell_value(self, element, value_tag, inline_tag, text_tag):
+        data_type = element.get("t", "n")
+        if data_type == "inlineStr":
+            child = element.find(inline_tag)
+            if child is None:
+                return ""
+            if len(child) == 1 and child[0].tag == text_tag:
+                return child[0].text or ""  # plain text, no rich text runs
+            return xl_text.Text.from_tree(child).content
+
+        value = element.findtext(value_tag)
+        if not value:
+            return ""
+        if data_type == "n":
+            number = float(value) if "." in value or "E" in value or "e" in value else int(value)
+            style_id = int(element.get("s") or 0)
+            if style_id in self.date_formats:
+                try:
+                    return xl_datetime.from_excel(number, self.epoch, timedelta=style_id in self.timedelta_formats)
+                except (OverflowError, ValueError):
+                    return np.nan
+            integer = int(number)
+            return integer if integer == number else float(number)
+        if data_type == "s":
+            return self.shared_strings[int(value)]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "e":
+            return np.nan
+        if data_type == "d":
+            return xl_datetime.from_ISO8601(value)
+        return value
+
+    def read_grid(self, sheet_name):
+        """Raw cell values of a sheet, row by row, as read_sheet_grid gives them"""
+        if sheet_name not in self._sheet_parts:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+        ns = f"{{{SHEET_MAIN_NS}}}"
+        row_tag, value_tag, inline_tag, text_tag = f"{ns}row", f"{ns}v", f"{ns}is", f"{ns}t"
+        columns = {}  # column letters -> index
+
+        rows = []
+        row_number = 0
+        with self.archive.open(self._sheet_parts[sheet_name]) as src:
+            for _, element in ElementTree.iterparse(src):
+                if element.tag != row_tag:
+                    continue
+                number = element.get("r")
+                row_number = int(float(number)) if number else row_number + 1
+
+                # Missing rows come out empty; out of order rows are dropped like openpyxl does
+                while len(rows) < row_number - 1:
+                    rows.append([])
+                if len(rows) >= row_number:
+                    element.clear()
+                    continue
+
+                cells = []
+                column = 0
+                for cell in element:
+                    coordinate = cell.get("r")
+                    if coordinate:
+                        letters = coordinate.rstrip("0123456789")
+                        column = columns.get(letters)
+                        if column is None:
+                            column = columns[letters] = xl_cell.column_index_from_string(letters)
+                    else:
+                        column += 1
+                    cells.append((column, self._cell_value(cell, value_tag, inline_tag, text_tag)))
+                element.clear()
+
+                # Row width is the column of its last cell
+                row = [""] * cells[-1][0] if cells else []
+                for column, value in cells:
+                    if column <= len(row):
+                        row[column - 1] = value
+                rows.append(row)
+        return trim_sheet_rows(rows)
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class OpenpyxlReader:
+    """openpyxl workbook with formulas and cell styles, the backend table extraction reads through.
+
+    Where the readers above give values only, this one hands out the source
+    cells, so their formatting can be copied. With streaming=True the workbook
+    is opened read-only: only the sheets asked for are parsed, row by row.
+
+    It is not one of READERS: those are interchangeable value grids for rule
+    generation, picked by name, while this one keeps formulas rather than
+    their cached values, so a read_grid here would not match theirs.
+    """
+
+    def __init__(self, excel_path, streaming=False):
+        self.streaming = streaming
+        self.wb = openpyxl.load_workbook(excel_path, read_only=streaming)
+
+    @property
+    def sheet_names(self):
+        return self.wb.sheetnames
+
+    def styled_rows(self, sheet_name):
+        """Rows of a sheet's cells, padded to the sheet width"""
+        return iter_sheet_rows(self.wb[sheet_name], self.streaming)
+
+    def styled_cells(self, sheet_name):
+        """Cells a full (not streaming) sheet holds, without creating the empty ones between them"""
+        return self.wb[sheet_name]._cells.values()
+
+    def styled_range(self, sheet_name, min_row, min_col, max_row, max_col):
+        """Rows of the cells in a box of a full sheet"""
+        return list(self.wb[sheet_name].iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col))
+
+    def close(self):
+        # Only read-only workbooks keep the file open
+        if self.streaming:
+            self.wb.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# name -> (factory, module it needs)
+READERS = {
+    "openpyxl": (lambda path: PandasReader(path, engine="openpyxl"), "openpyxl"),
+    "xml": (XmlReader, "openpyxl"),
+    "calamine": (lambda path: PandasReader(path, engine="calamine"), "python_calamine"),
+    "xlrd": (lambda path: PandasReader(path, engine="xlrd"), "xlrd"),
+}
+
+def reader_available(name):
+    return name in READERS and find_spec(READERS[name][1]) is not None
+
+def available_readers():
+    return [name for name in READERS if reader_available(name)]
+
+def resolve_reader(excel_path, reader=None):
+    """Reader name to use for a file; .xls goes to an engine that can read it"""
+    name = reader or SHEET_READER
+    if name not in READERS:
+        raise ValueError(f"Unknown reader: {name}, choose from {', '.join(READERS)}")
+    if source_name(excel_path).lower().endswith(".xls") and name not in ("calamine", "xlrd"):
+        # openpyxl and the XML parser only read xlsx
+        name = next((n for n in ("calamine", "xlrd") if reader_available(n)), None)
+        if name is None:
+            raise ValueError(".xls files need python-calamine or xlrd installed")
+    return name
+
+def open_reader(excel_path, reader=None):
+    """Open a workbook with the named reader (SHEET_READER by default)"""
+    factory, _ = READERS[resolve_reader(excel_path, reader)]
+    return factory(excel_path)
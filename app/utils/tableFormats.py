@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from importlib.util import find_spec
+
+def _json_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return str(value)
+
+def write_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(["" if value is None else value for value in row] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+def write_ndjson(rows):
+    """One JSON array per row"""
+    return "".join(
+        json.dumps(row, default=_json_value, ensure_ascii=False) + "\n" for row in rows
+    ).encode("utf-8")
+
+def write_parquet(rows):
+    """Columns column_1..column_N, typed where a column holds one type and strings otherwise"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    width = max((len(row) for row in rows), default=0)
+    columns = {}
+    for i in range(width):
+        values = [row[i] if i < len(row) else None for row in rows]
+        try:
+            columns[f"column_{i + 1}"] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            # Header rows above the data usually make a column mixed
+            columns[f"column_{i + 1}"] = pa.array([None if value is None else str(value) for value in values])
+    buffer = io.BytesIO()
+    pq.write_table(pa.table(columns), buffer)
+    return buffer.getvalue()
+
+# name -> (writer of a list of value rows, module it needs); xlsx keeps styles and
+# is written from the copied workbook instead
+OUTPUT_FORMATS = {
+    "xlsx": (None, "openpyxl"),
+    "csv": (write_csv, None),
+    "ndjson": (write_ndjson, None),
+    "parquet": (write_parquet, "pyarrow"),
+}
+
+def format_available(name):
+    if name not in OUTPUT_FORMATS:
+        return False
+    module = OUTPUT_FORMATS[name][1]
+    return module is None or find_spec(module) is not None
+
+def available_formats():
+    return [name for name in OUTPUT_FORMATS if format_available(name)]
+
+def encode_table(rows, output_format):
+    """Bytes of a values-only table file in one of the non-xlsx OUTPUT_FORMATS"""
+    writer, _ = OUTPUT_FORMATS[output_format]
+    return writer(rows)
@@ -0,0 +1,216 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from importlib.util import find_spec
+from starlette.formparsers import MultiPartParser
+
+# Configuration
+UPLOAD_MEMORY_BYTES = int(os.getenv("UPLOAD_MEMORY_BYTES", str(64 * 1024 * 1024)))  # larger workbooks spill to a temp file
+WORKBOOK_EXTENSIONS = (".xlsx", ".xls")
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+def multipart_available():
+    """Multipart form uploads need python-multipart; raw request bodies always work"""
+    return find_spec("python_multipart") is not None or find_spec("multipart") is not None
+
+class WorkbookBuffer(io.BytesIO):
+    """An uploaded workbook held in memory, usable wherever a workbook path is.
+
+    openpyxl, pandas and zipfile all read it like a file, and it pickles
+    with its name, so it can be handed to pool workers.
+    """
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+class UploadedWorkbook(io.RawIOBase):
+    """A multipart upload read in place from the file the form parser spooled it to.
+
+    Usable wherever a workbook path is, like WorkbookBuffer. The spooled file
+    isn't shared with pool workers, so it pickles as a WorkbookBuffer of its bytes.
+    """
+
+    def __init__(self, file, name):
+        super().__init__()
+        self.file = file
+        self.name = name
+        self.size = file.seek(0, io.SEEK_END)
+        file.seek(0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.file.read(size)
+
+    def readinto(self, b):
+        data = self.file.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+    def __reduce__(self):
+        self.file.seek(0)
+        return WorkbookBuffer, (self.file.read(), self.name)
+
+def source_name(source):
+    """File name of a workbook path, WorkbookBuffer or UploadedWorkbook"""
+    if isinstance(source, (WorkbookBuffer, UploadedWorkbook)):
+        return source.name
+    return os.path.basename(source)
+
+def source_size(source):
+    """Size in bytes of a workbook path, WorkbookBuffer or UploadedWorkbook"""
+    if isinstance(source, WorkbookBuffer):
+        return source.getbuffer().nbytes
+    if isinstance(source, UploadedWorkbook):
+        return source.size
+    return os.path.getsize(source)
+
+def unique_name(name, used):
+    """Base name of name with a number added if used has it already, added to used"""
+    stem, ext = os.path.splitext(os.path.basename(name))
+    candidate = f"{stem}{ext}"
+    n = 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    used.add(candidate)
+    return candidate
+
+def unique_names(names):
+    """Base names with a number added to repeats, so they can share a directory or zip"""
+    used = set()
+    return [unique_name(name, used) for name in names]
+
+class SpoolingFormParser(MultiPartParser):
+    """Multipart parser whose file parts count against an UploadSpool's limit.
+
+    Starlette keeps each file part in memory up to spool_max_size, 1 MB for
+    every file by default; here a part only gets what the spool has left
+    after the workbooks already held and the parts parsed before it, and goes
+    to a temp file past that. UploadSpool.hold() settles the total.
+    """
+
+    def __init__(self, headers, stream, spool):
+        super().__init__(headers, stream)
+        self.spool = spool
+
+    @property
+    def spool_max_size(self):
+        parsed = sum(value.size or 0 for _, value in self.items if not isinstance(value, str))
+        # 0 would keep the part in memory whatever its size
+        return max(self.spool.limit - self.spool.in_memory - parsed, 1)
+
+class UploadSpool:
+    """Workbooks of one upload, kept in memory up to limit bytes in total and in a temp directory past that.
+
+    close() removes anything that was spilled to disk and closes the held
+    multipart files.
+    """
+
+    def __init__(self, limit=UPLOAD_MEMORY_BYTES):
+        self.limit = limit
+        self.in_memory = 0  # bytes of the WorkbookBuffers and in-memory held files handed out so far
+        self._dir = None
+        self._spilled = 0
+        self._held = []
+        self._names = set()  # file names handed out, kept unique
+
+    def _spill_path(self, name):
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="upload_")
+        # One directory per file keeps the original name, which output names are built from
+        self._spilled += 1
+        folder = os.path.join(self._dir, str(self._spilled))
+        os.makedirs(folder)
+        return os.path.join(folder, os.path.basename(name))
+
+    async def receive(self, name, chunks):
+        """Collect an async stream of byte chunks, returns a WorkbookBuffer or the path it spilled to"""
+        name = unique_name(name, self._names)
+        # Chunks are written straight into the buffer that is handed out, so it is never copied
+        buffer = WorkbookBuffer(b"", name)
+        f = path = None
+        try:
+            async for chunk in chunks:
+                if f is None and self.in_memory + buffer.tell() + len(chunk) > self.limit:
+                    path = self._spill_path(name)
+                    f = open(path, "wb")
+                    f.write(buffer.getbuffer())
+                    buffer = None
+                if f is None:
+                    buffer.write(chunk)
+                else:
+                    f.write(chunk)
+        finally:
+            if f is not None:
+                f.close()
+        if path is not None:
+            return path
+        self.in_memory += buffer.tell()
+        buffer.seek(0)
+        return buffer
+
+    async def receive_form(self, request):
+        """Parse a multipart request with SpoolingFormParser, returns its FormData"""
+        return await SpoolingFormParser(request.headers, request.stream(), self).parse()
+
+    def hold(self, upload):
+        """A multipart UploadFile as an UploadedWorkbook, read in place; close() closes its file"""
+        self._held.append(upload.file)
+        workbook = UploadedWorkbook(upload.file, unique_name(upload.filename or "upload.xlsx", self._names))
+        if not getattr(upload.file, "_rolled", True):
+            # Parts that arrived in one chunk were all sized before any was written
+            if self.in_memory + workbook.size > self.limit:
+                upload.file.rollover()
+            else:
+                self.in_memory += workbook.size
+        return workbook
+
+    def expand(self, archive_source):
+        """Workbooks inside a zip archive (path or buffer), in archive order.
+
+        Members are unpacked into memory while the spool's running total stays
+        within limit, the rest into the temp directory.
+        """
+        with zipfile.ZipFile(archive_source) as archive:
+            members = [
+                member for member in archive.infolist()
+                if not member.is_dir()
+                and member.filename.lower().endswith(WORKBOOK_EXTENSIONS)
+                and not member.filename.startswith("__MACOSX/")
+                and not os.path.basename(member.filename).startswith("~$")  # Excel lock files
+            ]
+            sources = []
+            for member in members:
+                name = unique_name(member.filename, self._names)
+                if self.in_memory + member.file_size > self.limit:
+                    path = self._spill_path(name)
+                    with archive.open(member) as src, open(path, "wb") as dst:
+                        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_BYTES)
+                    sources.append(path)
+                else:
+                    # file_size caps what is read, whatever the member really holds
+                    self.in_memory += member.file_size
+                    sources.append(WorkbookBuffer(archive.read(member), name))
+            return sources
+
+    def close(self):
+        for file in self._held:
+            file.close()
+        self._held = []
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
@@ -0,0 +1,100 @@
+import itertools
+import os
+import tempfile
+import zipfile
+from .metrics import stage
+
+# Configuration
+ZIP_MEMORY_BYTES = int(os.getenv("ZIP_MEMORY_BYTES", str(64 * 1024 * 1024)))  # larger zips built for a response go to a temp file
+
+class _ChunkBuffer:
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunk = b"".join(self._chunks)
+        self._chunks = []
+        return chunk
+
+def iter_zip(entries):
+    """Zip (name, bytes) entries as they are produced, yielding the archive in chunks.
+
+    The buffer has no seek(), so zipfile writes data descriptors and never
+    goes back; each entry is sent as soon as it has been added.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w") as zipf:
+        for name, data in entries:
+            with stage("zip", name):
+                zipf.writestr(name, data)
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+    chunk = buffer.drain()
+    if chunk:
+        yield chunk
+
+def _write_zip(entries, f):
+    count = 0
+    def counted():
+        nonlocal count
+        for entry in entries:
+            count += 1
+            yield entry
+    for chunk in iter_zip(counted()):
+        f.write(chunk)
+    return count
+
+def write_zip(entries, zip_path):
+    """Stream entries into a zip file on disk, returns the number of entries"""
+    with open(zip_path, "wb") as f:
+        return _write_zip(entries, f)
+
+def spool(chunks, max_memory=ZIP_MEMORY_BYTES):
+    """Write byte chunks to a temp file kept in memory up to max_memory bytes, returns it rewound"""
+    f = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        for chunk in chunks:
+            f.write(chunk)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+def spool_zip(entries, max_memory=ZIP_MEMORY_BYTES):
+    """Zip entries into a temp file kept in memory up to max_memory bytes, returns (the file rewound, entry count)"""
+    f = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        count = _write_zip(entries, f)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f, count
+
+def peek(entries):
+    """Produce the first entry now, so early errors surface before a response starts.
+
+    Returns an iterator over all entries, or None if there are none.
+    """
+    entries = iter(entries)
+    try:
+        first = next(entries)
+    except StopIteration:
+        return None
+    return itertools.chain([first], entries)
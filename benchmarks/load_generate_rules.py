@@ -0,0 +1,103 @@
+"""Throughput of /generate-rules under concurrent requests.
+
+Starts uvicorn on a free port (or uses --url) and fires the same request
+serially and then with --concurrency clients in parallel:
+
+    python -m benchmarks.load_generate_rules --requests 16 --concurrency 4 --server-workers 4
+"""
+import argparse
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.synthetic import make_ruleset_workbook
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for_server(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/docs", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"❌ Server at {url} did not start")
+
+def fetch(request_url):
+    """Status and zip members of one response (zip bytes differ by timestamps)"""
+    with urllib.request.urlopen(request_url, timeout=600) as response:
+        with zipfile.ZipFile(io.BytesIO(response.read())) as archive:
+            members = tuple((name, archive.read(name)) for name in sorted(archive.namelist()))
+        return response.status, members
+
+def run(request_url, requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, [request_url] * requests))
+    elapsed = time.perf_counter() - start
+    return elapsed, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Use a running server instead of starting one")
+    parser.add_argument("--server-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--requests", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        input_dir = os.path.join(workdir, "input")
+        os.makedirs(input_dir)
+        for i in range(args.files):
+            make_ruleset_workbook(os.path.join(input_dir, f"ruleset_{i:03d}.xlsx"), 2, args.rows, 30, seed=i)
+
+        server = None
+        url = args.url
+        if url is None:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                 "--workers", str(args.server_workers), "--log-level", "warning"],
+                cwd=workdir,
+                env={**os.environ, "PYTHONPATH": os.getcwd()},
+                stdout=subprocess.DEVNULL,
+            )
+        try:
+            wait_for_server(url)
+            query = urllib.parse.urlencode({"excel_files_path": input_dir, "cache": "false"})
+            request_url = f"{url}/generate-rules?{query}"
+
+            print(f"{args.requests} requests, {args.files} workbooks each")
+            print(f"{'clients':>8} {'seconds':>9} {'req/s':>7}")
+            baseline = None
+            for concurrency in (1, args.concurrency):
+                elapsed, results = run(request_url, args.requests, concurrency)
+                bodies = {body for _, body in results}
+                if any(status != 200 for status, _ in results) or len(bodies) != 1:
+                    raise SystemExit(f"❌ Responses differ or failed with {concurrency} clients")
+                if baseline is None:
+                    baseline = bodies
+                elif bodies != baseline:
+                    raise SystemExit("❌ Concurrent output differs from serial output")
+                print(f"{concurrency:>8} {elapsed:>9.2f} {args.requests / elapsed:>7.2f}")
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+if __name__ == "__main__":
+    main()
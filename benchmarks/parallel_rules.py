@@ -0,0 +1,71 @@
+"""Rule generation scaling from 1 to N worker processes.
+
+Run from the repository root:
+
+    python -m benchmarks.parallel_rules --files 16 --rows 2000 --max-workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from app.utils.ruleRunner import generate_rules_for_workbooks
+from benchmarks.synthetic import make_ruleset_workbook
+
+@contextmanager
+def silenced():
+    """Send stdout of this process and its workers to /dev/null"""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(devnull)
+        os.close(saved)
+
+def run(excel_paths, workers):
+    start = time.perf_counter()
+    with silenced():
+        results = list(generate_rules_for_workbooks(excel_paths, workers))
+    return time.perf_counter() - start, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--cols", type=int, default=40)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        excel_paths = []
+        for i in range(args.files):
+            path = os.path.join(workdir, f"ruleset_{i:03d}.xlsx")
+            make_ruleset_workbook(path, args.sheets, args.rows, args.cols, seed=i)
+            excel_paths.append(path)
+
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= args.max_workers:
+            worker_counts.append(worker_counts[-1] * 2)
+        if worker_counts[-1] != args.max_workers:
+            worker_counts.append(args.max_workers)
+
+        print(f"{args.files} workbooks x {args.sheets} sheets x {args.rows} rows x {args.cols} cols")
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+        baseline_time = baseline = None
+        for workers in worker_counts:
+            elapsed, results = run(excel_paths, workers)
+            if baseline is None:
+                baseline_time, baseline = elapsed, results
+            elif results != baseline:
+                raise SystemExit(f"❌ Output with {workers} workers differs from the serial run")
+            print(f"{workers:>8} {elapsed:>9.2f} {baseline_time / elapsed:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
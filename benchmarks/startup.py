@@ -0,0 +1,142 @@
+"""Cold start: time to first response and memory per worker for each way of serving.
+
+Starts the server in each mode on a free port and measures how long until it
+answers /metrics, how long the first workbook request then takes (with lazy
+imports it pays for loading pandas/numpy/openpyxl) and, once that request is
+done, the RSS, PSS and private memory of every worker. PSS splits shared
+pages between the processes sharing them, so preforked workers sharing the
+preloaded libraries show a lower PSS and private size than spawned ones.
+Memory figures need Linux (/proc).
+
+    python -m benchmarks.startup --workers 4 --runs 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from benchmarks.load_generate_rules import free_port
+from benchmarks.synthetic import make_ruleset_workbook
+
+def modes(workers):
+    """name -> (command after python -m, extra environment, how to find the workers)"""
+    return {
+        "uvicorn (lazy)": (["uvicorn", "app.main:app"], {"WARM_UP": "0"}, "self"),
+        "uvicorn WARM_UP=1": (["uvicorn", "app.main:app"], {"WARM_UP": "1"}, "self"),
+        f"uvicorn --workers {workers}": (["uvicorn", "app.main:app", "--workers", str(workers)], {"WARM_UP": "1"}, "spawned"),
+        f"app.serve --workers {workers}": (["app.serve", "--workers", str(workers)], {"WARM_UP": "0"}, "forked"),
+    }
+
+def children(pid):
+    """Pids whose parent is pid"""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is in parentheses and may hold spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            found.append(int(entry))
+    return found
+
+def cmdline(pid):
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().replace(b"\0", b" ").decode(errors="replace")
+
+def worker_pids(process, kind):
+    if kind == "self":
+        return [process.pid]
+    pids = children(process.pid)
+    if kind == "spawned":
+        # uvicorn's workers, not multiprocessing's resource tracker
+        pids = [pid for pid in pids if "spawn_main" in cmdline(pid)]
+    return pids
+
+def memory(pid):
+    """RSS, PSS and private (USS) bytes of a process"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return values["Rss"], values["Pss"], values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+
+def wait_for_response(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+                return
+        except OSError:
+            time.sleep(0.01)
+    raise SystemExit(f"❌ Server at {url} did not answer")
+
+def run_mode(command, env, kind, workbook_url_path):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", *command, "--port", str(port)],
+        env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_response(f"{url}/metrics")
+        first_response = time.perf_counter() - start
+
+        request_start = time.perf_counter()
+        with urllib.request.urlopen(url + workbook_url_path, timeout=600) as response:
+            response.read()
+        first_workbook = time.perf_counter() - request_start
+
+        time.sleep(0.5)
+        usage = []
+        if os.path.isdir("/proc"):
+            usage = [memory(pid) for pid in worker_pids(process, kind)]
+        return first_response, first_workbook, usage
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def mb(n):
+    return f"{n / 1024 / 1024:.0f}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--runs", type=int, default=3, help="Starts per mode, the fastest is reported")
+    parser.add_argument("--only", action="append", help="Run only modes whose name contains this (repeatable)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        make_ruleset_workbook(os.path.join(workdir, "ruleset.xlsx"), sheets=2, rows=200, cols=20)
+        query = urllib.parse.urlencode({"excel_files_path": workdir, "stream": "false", "cache": "false"})
+        workbook_url_path = f"/generate-rules?{query}"
+
+        print(f"{'mode':<26} {'first response':>15} {'first workbook':>15} {'workers':>8} {'RSS MB':>7} {'PSS MB':>7} {'USS MB':>7} {'total PSS':>10}")
+        for name, (command, env, kind) in modes(args.workers).items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            runs = [run_mode(command, env, kind, workbook_url_path) for _ in range(args.runs)]
+            first_response, first_workbook, usage = min(runs, key=lambda run: run[0])
+            if usage:
+                n = len(usage)
+                rss, pss, uss = (sum(values) / n for values in zip(*usage))
+                memory_columns = f"{n:>8} {mb(rss):>7} {mb(pss):>7} {mb(uss):>7} {mb(pss * n):>10}"
+            else:
+                memory_columns = f"{'n/a':>8}"
+            print(f"{name:<26} {first_response:>14.2f}s {first_workbook:>14.2f}s {memory_columns}")
+
+if __name__ == "__main__":
+    main()
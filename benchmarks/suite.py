@@ -0,0 +1,179 @@
+"""Time the rule and extract pipelines on synthetic rulesets and compare with a baseline.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --save-baseline        # record benchmarks/baseline.json
+    python -m benchmarks.suite                         # compare against it
+    python -m benchmarks.suite --check --tolerance 0.2 # exit 1 on a >20% slowdown
+
+Each case is timed --repeat times (median wall time), then run once more
+under tracemalloc for peak Python memory. Endpoints are called in process
+through TestClient with the result cache off.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from benchmarks.parallel_rules import silenced
+from benchmarks.synthetic import make_ruleset_workbook
+from app.utils.extractTables import extract_tables_with_formatting
+from app.utils.generateRules import (
+    clean_dataframe,
+    find_header_row,
+    frame_from_grid,
+    generate_rules_from_sheet,
+    read_sheet_grid,
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+def measure(func, repeat):
+    """Median wall time over repeat runs and peak traced memory of one more run"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with silenced():
+            func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        with silenced():
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(times), "peak_mb": peak / (1024 * 1024)}
+
+def build_cases(workdir, args):
+    """name -> zero-argument callable for every benchmark case"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    rules_dir = os.path.join(workdir, "rulesets")
+    os.makedirs(rules_dir)
+    excel_paths = [
+        make_ruleset_workbook(
+            os.path.join(rules_dir, f"ruleset_{i:03d}.xlsx"), args.sheets, args.rows, args.cols,
+            args.blocks, args.header_bands, args.density, seed=i
+        )
+        for i in range(args.files)
+    ]
+    first = excel_paths[0]
+
+    # Per-stage inputs are prepared once, so each case times only its own function
+    with pd.ExcelFile(first) as xls:
+        sheet_name = xls.sheet_names[0]
+        grid = read_sheet_grid(xls, sheet_name)
+    raw_df = frame_from_grid(grid)
+    header_row = find_header_row(raw_df)
+    df = frame_from_grid(grid, header=header_row)
+    cleaned = clean_dataframe(df)
+
+    client = TestClient(app)
+    extract_params = {"excel_path": first, "start_sheet": "Sheet_1", "end_sheet": f"Sheet_{args.sheets}", "cache": False}
+    rules_params = {"excel_files_path": rules_dir, "cache": False}
+
+    def check(response):
+        if response.status_code != 200 or response.headers.get("content-type") != "application/zip":
+            raise SystemExit(f"❌ Unexpected response: {response.status_code} {response.text[:200]}")
+
+    def read_grid():
+        with pd.ExcelFile(first) as xls:
+            read_sheet_grid(xls, sheet_name)
+
+    def extract():
+        with tempfile.TemporaryDirectory() as output_dir:
+            extract_tables_with_formatting(first, output_dir, "Sheet_1", f"Sheet_{args.sheets}")
+
+    return {
+        "read_sheet_grid": read_grid,
+        "find_header_row": lambda: find_header_row(raw_df),
+        "clean_dataframe": lambda: clean_dataframe(df),
+        "generate_rules_from_sheet": lambda: generate_rules_from_sheet(cleaned, sheet_name),
+        "extract_tables_with_formatting": extract,
+        "GET /extract": lambda: check(client.get("/extract", params=extract_params)),
+        "GET /generate-rules": lambda: check(client.get("/generate-rules", params=rules_params)),
+    }
+
+def compare(results, baseline, tolerance):
+    """Print results next to the baseline, return the names of cases that got slower"""
+    print(f"{'case':<32} {'seconds':>9} {'base':>9} {'ratio':>7} {'peak MB':>9} {'base':>9}")
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32} {result['seconds']:>9.3f} {'-':>9} {'-':>7} {result['peak_mb']:>9.1f} {'-':>9}")
+            continue
+        ratio = result["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = " ⚠️ slower"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            flag = " ✅ faster"
+        print(
+            f"{name:<32} {result['seconds']:>9.3f} {base['seconds']:>9.3f} {ratio:>6.2f}x "
+            f"{result['peak_mb']:>9.1f} {base['peak_mb']:>9.1f}{flag}"
+        )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--cols", type=int, default=30)
+    parser.add_argument("--blocks", type=int, default=2)
+    parser.add_argument("--header-bands", type=int, default=2)
+    parser.add_argument("--density", type=float, default=2 / 3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", action="append", help="Run only cases whose name contains this (repeatable)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before a case is flagged")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any case is slower than the baseline")
+    args = parser.parse_args()
+
+    params = {
+        key: getattr(args, key)
+        for key in ("files", "sheets", "rows", "cols", "blocks", "header_bands", "density")
+    }
+    print(f"Synthetic rulesets: {params}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep job/cache folders of the app out of the working directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            cases = build_cases(workdir, args)
+            if args.only:
+                cases = {name: func for name, func in cases.items() if any(part in name for part in args.only)}
+            results = {name: measure(func, args.repeat) for name, func in cases.items()}
+        finally:
+            os.chdir(cwd)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("params") != params:
+            print(f"⚠️ Baseline was recorded with {stored.get('params')}, numbers are not comparable")
+        baseline = stored.get("cases", {})
+
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "python": platform.python_version(), "cases": results}, f, indent=2)
+        print(f"💾 Saved baseline to {args.baseline}")
+    elif args.check and regressions:
+        raise SystemExit(f"❌ Slower than baseline: {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Synthetic workbooks shaped like our rulesets.
+
+Each sheet has a title row, then `blocks` tables separated by a blank row.
+A table is `header_bands` colored header rows (group labels above the column
+headers) followed by `rows` rows of a key column and a Y/N option matrix
+where `density` is the share of Y cells.
+
+    python -m benchmarks.synthetic out.xlsx --sheets 4 --rows 500 --cols 30 --blocks 2
+"""
+import argparse
+import random
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill
+
+HEADER_FILLS = ["FFD9E1F2", "FFFCE4D6", "FFE2EFDA"]
+
+def make_ruleset_workbook(path, sheets=3, rows=1000, cols=40, blocks=1, header_bands=1, density=2 / 3, seed=0):
+    """Write a ruleset-shaped workbook and return its path"""
+    rng = random.Random(seed)
+    wb = Workbook()
+    wb.remove(wb.active)
+    bold = Font(bold=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Sheet_{s + 1}")
+        ws.append(["Ruleset", f"Sheet {s + 1} rev {seed}"])
+        ws.append([])
+
+        for b in range(blocks):
+            for band in range(header_bands):
+                fill = PatternFill("solid", fgColor=HEADER_FILLS[band % len(HEADER_FILLS)])
+                if band == header_bands - 1:
+                    values = ["Valve Size"] + [f"Option {b + 1}.{c}" for c in range(1, cols)]
+                else:
+                    # Group label every few columns, like merged group headers
+                    values = ["" if c % 5 else f"Group {band + 1}.{c // 5 + 1}" for c in range(cols)]
+                ws.append(values)
+                for cell in ws[ws.max_row]:
+                    cell.fill = fill
+                    cell.font = bold
+
+            for r in range(rows):
+                ws.append([f"V{b + 1}-{r:05d}"] + ["Y" if rng.random() < density else "N" for _ in range(1, cols)])
+            if b < blocks - 1:
+                ws.append([])
+    wb.save(path)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--cols", type=int, default=40)
+    parser.add_argument("--blocks", type=int, default=1)
+    parser.add_argument("--header-bands", type=int, default=1)
+    parser.add_argument("--density", type=float, default=2 / 3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_ruleset_workbook(
+        args.path, args.sheets, args.rows, args.cols, args.blocks, args.header_bands, args.density, args.seed
+    )
+    print(f"💾 Wrote {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""The /generate-rules pipeline as it was before the single-parse change, kept as a reference for tests.
+
+Each sheet is read twice with pd.read_excel (raw for the header search, then
+with the detected header) and run through the original row-by-row helpers.
+"""
+import os
+import re
+import pandas as pd
+
+PREFIX = "KEY-GR"
+
+def clean_identifier(s):
+    s = str(s).strip()
+    s = re.sub(r'[^\w\s]', '', s)
+    s = re.sub(r'\s+', '_', s)
+    return s
+
+def find_key_column(df):
+    uniqueness = {col: df[col].nunique() for col in df.columns}
+    length_scores = {}
+    for col in df.columns:
+        length_scores[col] = df[col].astype(str).str.len().mean()
+
+    best_col = None
+    best_score = -1
+    for col in df.columns:
+        if df[col].isna().mean() > 0.5:
+            continue
+        uniqueness_score = uniqueness[col] / len(df)
+        length_score = 1 - (length_scores[col] / (length_scores[col] + 10))
+        score = uniqueness_score * 0.7 + length_score * 0.3
+        if score > best_score:
+            best_score = score
+            best_col = col
+    return best_col
+
+def find_header_row(raw_df):
+    row_scores = []
+    for idx, row in raw_df.iterrows():
+        non_empty = row.notna().sum()
+        unique_vals = row.dropna().astype(str).str.strip().nunique()
+        str_complexity = row.dropna().astype(str).str.len().sum() / (non_empty or 1)
+        row_scores.append((idx, (non_empty * 0.4) + (unique_vals * 0.4) + (str_complexity * 0.2)))
+    row_scores.sort(key=lambda x: x[1], reverse=True)
+    return row_scores[0][0] if row_scores else 0
+
+def clean_dataframe(df):
+    df.columns = [clean_identifier(col) for col in df.columns]
+    df = df.dropna(how='all').reset_index(drop=True)
+    df = df.dropna(axis=1, how='all')
+    df = df.map(lambda x: str(x).strip() if pd.notna(x) else x)
+    return df
+
+def generate_rules_from_sheet(df, sheet_name):
+    key_col = find_key_column(df)
+    if not key_col:
+        return []
+    key_values = df[key_col].astype(str).str.strip()
+    key_values = key_values[key_values != ""]
+
+    rules = []
+    for col in df.columns:
+        if col == key_col or df[col].isna().all():
+            continue
+        col_values = df[col].astype(str).str.strip().str.upper()
+        excluded_keys = key_values[col_values == "N"].unique()
+        if len(excluded_keys) > 0:
+            safe_keys = [clean_identifier(v) for v in excluded_keys if v]
+            safe_col = clean_identifier(col)
+            key_entries = ", ".join(
+                [f"'{PREFIX}'.'{clean_identifier(key_col)}'.'{v}'" for v in safe_keys]
+            )
+            rules.append(
+                f"AnyTrue({key_entries}) "
+                f"Excludes AnyTrue('{PREFIX}'.'{clean_identifier(col)}'.'{safe_col}')"
+            )
+    return rules
+
+def reference_rule_files(excel_files_path):
+    """{"{input}_rules.txt": bytes} for every workbook that produces rules"""
+    rule_files = {}
+    for excel_file in os.listdir(excel_files_path):
+        if not excel_file.lower().endswith((".xlsx", ".xls")):
+            continue
+        try:
+            xls = pd.ExcelFile(os.path.join(excel_files_path, excel_file))
+        except Exception:
+            continue
+        all_rules = []
+        with xls:
+            for sheet_name in xls.sheet_names:
+                try:
+                    raw_df = pd.read_excel(xls, sheet_name=sheet_name, header=None)
+                    df = pd.read_excel(xls, sheet_name=sheet_name, header=find_header_row(raw_df))
+                    df = clean_dataframe(df)
+                    if df.empty:
+                        continue
+                    all_rules.extend(generate_rules_from_sheet(df, sheet_name))
+                except Exception:
+                    continue
+        if all_rules:
+            name = f"{os.path.splitext(excel_file)[0]}_rules.txt"
+            rule_files[name] = "\n".join([rule + ";" for rule in all_rules]).encode("utf-8")
+    return rule_files
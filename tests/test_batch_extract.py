@@ -0,0 +1,41 @@
+"""A batch extracts every item into its own folder, and a failing item only fails itself."""
+import io
+import json
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.batchExtract import item_folders
+from benchmarks.synthetic import make_ruleset_workbook
+
+def test_item_folders_are_unique():
+    items = [{"excel_path": path} for path in ("a/book.xlsx", "b/book.xlsx", "c/book.xls", "other.xlsx", "/")]
+    assert item_folders(items) == ["book", "book_2", "book_3", "other", "workbook"]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_with_duplicate_names_and_a_failing_item(tmp_path, workers):
+    for folder, seed in (("a", 1), ("b", 2)):
+        (tmp_path / folder).mkdir()
+        make_ruleset_workbook(str(tmp_path / folder / "book.xlsx"), sheets=2, rows=30, cols=6, seed=seed)
+    (tmp_path / "broken.xlsx").write_bytes(b"not a workbook")
+    items = [
+        {"excel_path": str(tmp_path / "a" / "book.xlsx"), "start_sheet": "Sheet_1", "end_sheet": "Sheet_2"},
+        {"excel_path": str(tmp_path / "broken.xlsx"), "start_sheet": "Sheet_1", "end_sheet": "Sheet_1"},
+        {"excel_path": str(tmp_path / "b" / "book.xlsx"), "start_sheet": "Sheet_2", "end_sheet": "Sheet_2"},
+        {"excel_path": str(tmp_path / "missing.xlsx"), "start_sheet": "Sheet_1", "end_sheet": "Sheet_1"},
+    ]
+    response = TestClient(app).post("/extract/batch", params={"workers": workers, "output_format": "csv"}, json={"items": items})
+    assert response.status_code == 200
+    assert response.headers["X-Items-Processed"] == "2" and response.headers["X-Items-Failed"] == "2"
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        names = archive.namelist()
+        report = json.loads(archive.read("batch_report.json"))
+    assert {name.split("/")[0] for name in names} == {"book", "book_2", "batch_report.json"}
+    assert {name.split("/")[1].rsplit("_", 1)[0] for name in names if name.startswith("book/")} == {"Sheet_1", "Sheet_2"}
+    assert {name.split("/")[1].rsplit("_", 1)[0] for name in names if name.startswith("book_2/")} == {"Sheet_2"}
+
+    assert [entry["folder"] for entry in report] == ["book", "broken", "book_2", "missing"]
+    assert [bool(entry["error"]) for entry in report] == [False, True, False, True]
+    assert report[3]["error"].startswith("File not found")
+    assert report[1]["tables"] == 0 and report[0]["tables"] > 0
@@ -0,0 +1,111 @@
+"""Batch runs write the service's outputs into a directory tree and resume from progress.jsonl."""
+import json
+import os
+import subprocess
+import sys
+import pytest
+from app.cli import main, parse_args
+from app.utils.progressJournal import JOURNAL_NAME, ProgressJournal, file_signature
+from benchmarks.synthetic import make_ruleset_workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def tree(tmp_path):
+    """input/a.xlsx and input/sub/b.xlsx, two sheets each"""
+    (tmp_path / "input" / "sub").mkdir(parents=True)
+    make_ruleset_workbook(str(tmp_path / "input" / "a.xlsx"), sheets=2, rows=30, cols=6, seed=1)
+    make_ruleset_workbook(str(tmp_path / "input" / "sub" / "b.xlsx"), sheets=2, rows=30, cols=6, seed=2)
+    return tmp_path
+
+def journal_entries(path):
+    """Entries of a journal, without lines torn by a crash"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                pass
+    return entries
+
+def test_rules_mirror_the_tree_and_resume(tree, capsys):
+    argv = ["rules", str(tree / "input"), str(tree / "out"), "--workers", "1"]
+    assert main(argv) == 0
+    a, b = tree / "out" / "a_rules.txt", tree / "out" / "sub" / "b_rules.txt"
+    assert a.read_text().strip() and b.read_text().strip()
+    assert sorted(e["workbook"] for e in journal_entries(tree / "out" / JOURNAL_NAME)) == ["a.xlsx", os.path.join("sub", "b.xlsx")]
+
+    # Nothing left to do, so nothing is rewritten
+    a.write_text("kept")
+    capsys.readouterr()
+    assert main(argv) == 0
+    assert "2 workbooks, 2 already done, 0 to run" in capsys.readouterr().out
+    assert a.read_text() == "kept"
+
+    # A changed workbook runs again, the other one is still done
+    make_ruleset_workbook(str(tree / "input" / "sub" / "b.xlsx"), sheets=2, rows=31, cols=6, seed=3)
+    assert main(argv) == 0
+    assert "2 workbooks, 1 already done, 1 to run" in capsys.readouterr().out
+    assert a.read_text() == "kept"
+
+    # Other settings don't count as done, --restart ignores the journal
+    assert main(argv + ["--compact"]) == 0
+    assert "0 already done, 2 to run" in capsys.readouterr().out
+    assert main(argv + ["--compact", "--restart"]) == 0
+    assert "0 already done, 2 to run" in capsys.readouterr().out
+    assert len(journal_entries(tree / "out" / JOURNAL_NAME)) == 2
+
+def test_failed_workbooks_run_again(tree, capsys):
+    (tree / "input" / "broken.xlsx").write_bytes(b"not a workbook")
+    argv = ["rules", str(tree / "input"), str(tree / "out"), "--workers", "1"]
+    assert main(argv) == 1
+    capsys.readouterr()
+    assert main(argv) == 1
+    assert "3 workbooks, 2 already done, 1 to run" in capsys.readouterr().out
+
+def test_extract_layouts(tree):
+    argv = ["extract", str(tree / "input"), str(tree / "out"), "--start-sheet", "Sheet_1", "--end-sheet", "Sheet_2", "--workers", "1"]
+    assert main(argv) == 0
+    tables = set(os.listdir(tree / "out" / "a"))
+    assert {name.rsplit("_", 1)[0] for name in tables} == {"Sheet_1", "Sheet_2"}
+    assert set(os.listdir(tree / "out" / "sub" / "b")) == tables
+
+    # One workbook's tables straight into the output directory
+    flat = argv[:1] + [str(tree / "input" / "a.xlsx"), str(tree / "flat")] + argv[3:] + ["--flat"]
+    assert main(flat) == 0
+    assert set(os.listdir(tree / "flat")) == tables | {JOURNAL_NAME}
+    with pytest.raises(SystemExit):
+        parse_args(argv + ["--flat"])
+
+def test_initial_script_runs_as_a_file(tree):
+    script = os.path.join(ROOT, "app", "initial", "extractTables.py")
+    result = subprocess.run(
+        [sys.executable, script, str(tree / "input" / "a.xlsx"), "tables", "--start-sheet", "Sheet_1", "--end-sheet", "Sheet_1"],
+        cwd=tree, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    names = set(os.listdir(tree / "tables"))
+    assert JOURNAL_NAME in names and "Sheet_1_1.xlsx" in names
+    assert all(name.startswith("Sheet_1_") for name in names - {JOURNAL_NAME})
+
+def test_journal_skips_torn_lines_and_other_settings(tmp_path):
+    workbook = tmp_path / "a.xlsx"
+    workbook.write_bytes(b"data")
+    signature = file_signature(workbook)
+    path = str(tmp_path / JOURNAL_NAME)
+    with ProgressJournal(path, {"command": "rules"}) as journal:
+        journal.record("a.xlsx", signature, rules=3)
+        journal.record("b.xlsx", signature, error="Could not open workbook")
+    with open(path, "ab") as f:
+        f.write(b'{"workbook": "c.xl')  # cut off by a crash
+
+    with ProgressJournal(path, {"command": "rules"}) as journal:
+        assert journal.is_done("a.xlsx", signature)
+        assert not journal.is_done("b.xlsx", signature)
+        assert not journal.is_done("a.xlsx", [signature[0] + 1, signature[1]])
+        journal.record("c.xlsx", signature)
+    with ProgressJournal(path, {"command": "extract"}) as journal:
+        assert not journal.is_done("a.xlsx", signature)
+    # The torn line stays on its own line
+    assert [e["workbook"] for e in journal_entries(path)] == ["a.xlsx", "b.xlsx", "c.xlsx"]
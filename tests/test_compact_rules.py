@@ -0,0 +1,71 @@
+"""Compaction merges rules with the same keys, drops duplicates and keeps the rules' meaning."""
+import io
+import zipfile
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+from app.main import app
+from app.utils.generateRules import compact_rules, compaction_stats, decode_rules, format_rule, parse_rule
+
+def terms(*names):
+    return [f"'KEY-GR'.'{name}'.'{name}'" for name in names]
+
+def exclusions(rules):
+    """Every (key, option) pair the rules exclude"""
+    pairs = set()
+    for rule in rules:
+        key_terms, option_terms = parse_rule(rule)
+        pairs.update((key, option) for key in key_terms for option in option_terms)
+    return pairs
+
+def test_rules_with_the_same_keys_are_merged():
+    rules = [
+        format_rule(terms("K1", "K2"), terms("A")),
+        format_rule(terms("K3"), terms("B")),
+        format_rule(terms("K2", "K1"), terms("C")),  # same keys in another order
+        format_rule(terms("K1", "K2"), terms("A")),  # duplicate
+        "not a rule",
+        "not a rule",
+    ]
+    compacted, stats = compact_rules(rules)
+    assert compacted == [
+        format_rule(terms("K1", "K2"), terms("A", "C")),
+        format_rule(terms("K3"), terms("B")),
+        "not a rule",
+    ]
+    assert stats == {"rules_in": 6, "rules_out": 3, "reduction": 0.5}
+    # Parsed back, the compacted rules exclude the same pairs
+    assert exclusions(compacted[:2]) == exclusions(rules[:4])
+    assert compact_rules(compacted)[0] == compacted
+
+def test_compaction_stats_add_up():
+    assert compaction_stats([]) == {"rules_in": 0, "rules_out": 0, "reduction": 0.0}
+    assert compaction_stats([
+        {"rules_in": 6, "rules_out": 3, "reduction": 0.5},
+        {"rules_in": 2, "rules_out": 2, "reduction": 0.0},
+    ]) == {"rules_in": 8, "rules_out": 5, "reduction": 0.375}
+
+def test_compaction_headers(tmp_path):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title in ("One", "Two"):
+        # Opt A and Opt B exclude the same keys; the second sheet repeats the first
+        ws = wb.create_sheet(title)
+        ws.append(["Size", "Opt A", "Opt B", "Opt C"])
+        for row in [["DN1", "N", "N", "Y"], ["DN2", "Y", "Y", "N"], ["DN3", "N", "N", "Y"], ["DN4", "Y", "Y", "Y"]]:
+            ws.append(row)
+    wb.save(tmp_path / "sizes.xlsx")
+    client = TestClient(app)
+    params = {"excel_files_path": str(tmp_path), "cache": "false"}
+
+    plain = client.get("/generate-rules", params=params)
+    compacted = client.get("/generate-rules", params={**params, "compact": "true"})
+    assert "X-Rules-Before-Compaction" not in plain.headers
+    assert compacted.headers["X-Rules-Before-Compaction"] == "6"
+    assert compacted.headers["X-Rules-After-Compaction"] == "2"
+    assert compacted.headers["X-Rule-Reduction-Ratio"] == "0.6667"
+
+    with zipfile.ZipFile(io.BytesIO(plain.content)) as a, zipfile.ZipFile(io.BytesIO(compacted.content)) as b:
+        before = decode_rules(a.read("sizes_rules.txt"))
+        after = decode_rules(b.read("sizes_rules.txt"))
+    assert len(before) == 6 and len(after) == 2
+    assert exclusions(after) == exclusions(before)
@@ -0,0 +1,54 @@
+"""The constraint index knows every key and option of the sheets, not just the ones in rules."""
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+from app.main import app
+from app.utils.constraintIndex import ConstraintIndex
+
+def make_index():
+    index = ConstraintIndex()
+    keys = [("Size", "15"), ("Size", "3")]
+    options = [("Opt_A", "Opt_A"), ("Opt_B", "Opt_B")]
+    exclusions = [([("Size", "15")], [("Opt_A", "Opt_A")])]
+    index.add("a_rules.txt", keys, options, exclusions)
+    # The same rule from another file is kept once
+    index.add("b_rules.txt", keys, options, exclusions)
+    return index
+
+def test_keys_and_options_without_exclusions_are_allowed():
+    index = make_index()
+    assert index.stats()["rules"] == 1 and index.stats()["options"] == 4
+    assert index.evaluate(["Size.3", "Opt_B"]) == {"valid": True, "violations": [], "unknown": []}
+    assert index.evaluate(["Size.3", "Opt_A", "Size.9", "Other"]) == {"valid": True, "violations": [], "unknown": ["Size.9", "Other"]}
+
+@pytest.mark.parametrize("key", ["Size.1.5", "Size.15", "'KEY-GR'.'Size'.'15'"])
+def test_keys_with_dots(key):
+    result = make_index().evaluate([key, "Opt A"])
+    assert not result["valid"] and result["unknown"] == []
+    assert result["violations"] == [{
+        "rule_file": "a_rules.txt",
+        "rule": "AnyTrue('KEY-GR'.'Size'.'15') Excludes AnyTrue('KEY-GR'.'Opt_A'.'Opt_A')",
+        "keys": ["Size.15"],
+        "options": ["Opt_A.Opt_A"],
+    }]
+
+def test_evaluate_endpoint(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Size", "Opt A", "Opt B", "Opt C"])
+    for row in [["DN1.5", "N", "Y", "Y"], ["DN2", "Y", "Y", "N"], ["DN3", "Y", "Y", "Y"], ["DN4", "Y", "Y", "Y"]]:
+        ws.append(row)
+    wb.save(tmp_path / "sizes.xlsx")
+    client = TestClient(app)
+    params = {"excel_files_path": str(tmp_path)}
+
+    response = client.post("/evaluate", params=params, json={"selected": ["Size.DN1.5", "Opt_A"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert not body["valid"] and body["unknown"] == []
+    assert body["violations"][0]["rule_file"] == "sizes_rules.txt"
+    assert body["index"]["rules"] == 2
+
+    configurations = [["Size.DN3", "Opt_B"], ["Size.DN2", "Opt_C"], ["Size.DN2", "Opt_D"]]
+    results = client.post("/evaluate", params=params, json={"configurations": configurations}).json()["results"]
+    assert [(r["valid"], r["unknown"]) for r in results] == [(True, []), (False, []), (True, ["Opt_D"])]
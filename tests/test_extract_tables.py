@@ -0,0 +1,167 @@
+"""Table detection: full-width rows by default, regions that keep every table's columns."""
+import csv
+import datetime
+import io
+import zipfile
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font, PatternFill
+from openpyxl.xml.functions import tostring
+from app.main import app
+from app.utils import extractTables
+from app.utils.extractTables import (
+    copy_cell_format,
+    find_table_regions,
+    iter_table_files,
+    iter_table_workbooks,
+    style_cache_stats,
+)
+from benchmarks.synthetic import make_ruleset_workbook
+
+HEADER_FILL = PatternFill("solid", fgColor="FFD9E1F2")
+
+def write_table(ws, top, left, headers, rows):
+    """Filled header row at (top, left) with the rows below it"""
+    for c, value in enumerate(headers):
+        cell = ws.cell(row=top, column=left + c, value=value)
+        cell.fill = HEADER_FILL
+    for r, row in enumerate(rows, start=1):
+        for c, value in enumerate(row):
+            ws.cell(row=top + r, column=left + c, value=value)
+
+def option_rows(n, width, prefix):
+    return [[f"{prefix}{r}"] + ["Y" if (r + c) % 3 else "N" for c in range(1, width)] for r in range(n)]
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    wb = Workbook()
+    side = wb.active
+    side.title = "Side"
+    # Two tables with two blank columns (D:E) between them
+    write_table(side, 1, 1, ["Size", "A", "B"], option_rows(5, 3, "S"))
+    write_table(side, 1, 6, ["Type", "C", "D"], option_rows(5, 3, "T"))
+
+    spacer = wb.create_sheet("Spacer")
+    # A:F, a blank spacer column G, then a one-column Date table in H
+    write_table(spacer, 1, 1, ["Size", "O1", "O2", "O3", "O4", "O5"], option_rows(40, 6, "V"))
+    spacer.cell(row=1, column=8, value="Date").fill = HEADER_FILL
+    for r in range(2, 42):
+        spacer.cell(row=r, column=8, value=datetime.date(2024, 1, 1) + datetime.timedelta(days=r))
+
+    stray = wb.create_sheet("Stray")
+    write_table(stray, 1, 1, ["Size", "A", "B", "C"], option_rows(8, 4, "X"))
+    stray["F3"] = "near"    # past a spacer column, part of the table
+    stray["K5"] = "check"   # shares the table's rows, far to the right
+    stray.cell(row=2, column=3000).fill = HEADER_FILL  # a lone colored cell far out
+    stray["A20"] = "note"   # on its own below the table
+
+    path = tmp_path_factory.mktemp("extract") / "tables.xlsx"
+    wb.save(path)
+    return str(path)
+
+def tables(excel_path, sheet_name, detect, streaming=False):
+    """{table name: rows of csv values}"""
+    return {
+        name: list(csv.reader(io.StringIO(data.decode())))
+        for name, data in iter_table_files(excel_path, sheet_name, sheet_name, streaming, detect=detect, output_format="csv")
+    }
+
+def test_regions_of_marks():
+    block = {row: [1, 2, 3] for row in range(1, 6)}
+    # Side by side with two blank columns, or one spacer column between them
+    assert find_table_regions({row: cols + [6, 7] for row, cols in block.items()}) == [(1, 1, 5, 3), (1, 6, 5, 7)]
+    assert find_table_regions({row: cols + [5, 6] for row, cols in block.items()}) == [(1, 1, 5, 6)]
+    # A one-column run past a spacer column joins the table, further out it is a region of its own
+    assert find_table_regions({row: cols + [5] for row, cols in block.items()}) == [(1, 1, 5, 5)]
+    assert find_table_regions({row: cols + [9] for row, cols in block.items()}) == [(1, 1, 5, 3), (1, 9, 5, 9)]
+    # Lone cells join only a table within the gap, otherwise they are dropped
+    assert find_table_regions({**block, 3: [1, 2, 3, 5], 4: [1, 2, 3, 3000], 8: [4]}) == [(1, 1, 5, 5)]
+    assert find_table_regions({1: [1, 2], 2: [1, 2], 3: [], 7: [5]}) == [(1, 1, 2, 2)]
+    # The table widens further down, so a cell beside its first rows joins it once it closes
+    assert find_table_regions({1: [1, 2, 6], 2: [1, 2], 3: [1, 2, 3, 4]}) == [(1, 1, 3, 6)]
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_side_by_side_tables(workbook, streaming):
+    found = tables(workbook, "Side", "regions", streaming)
+    assert list(found) == ["Side_1.csv", "Side_2.csv"]
+    assert found["Side_1.csv"][0] == ["Size", "A", "B"]
+    assert found["Side_2.csv"][0] == ["Type", "C", "D"]
+    assert len(found["Side_2.csv"]) == 6
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_spacer_column_keeps_the_date_column(workbook, streaming):
+    found = tables(workbook, "Spacer", "regions", streaming)
+    assert list(found) == ["Spacer_1.csv"]
+    rows = found["Spacer_1.csv"]
+    assert len(rows) == 41
+    assert rows[0] == ["Size", "O1", "O2", "O3", "O4", "O5", "", "Date"]
+    assert all(row[7] for row in rows)
+    # The full-width scan sees the same table
+    assert tables(workbook, "Spacer", "rows", streaming) == found
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_stray_cells(workbook, streaming):
+    found = tables(workbook, "Stray", "regions", streaming)
+    assert list(found) == ["Stray_1.csv"]
+    rows = found["Stray_1.csv"]
+    # The table keeps its own columns plus the cell past the spacer column, nothing further out
+    assert len(rows) == 9 and {len(row) for row in rows} == {6}
+    assert rows[2][5] == "near"
+    assert not any("check" in row or "note" in row for row in rows)
+
+def test_extract_detects_rows_by_default(workbook):
+    client = TestClient(app)
+    params = {"excel_path": workbook, "start_sheet": "Side", "end_sheet": "Stray", "output_format": "csv", "cache": "false"}
+    default = client.get("/extract", params=params)
+    rows = client.get("/extract", params={**params, "detect": "rows"})
+    assert default.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(default.content)) as a, zipfile.ZipFile(io.BytesIO(rows.content)) as b:
+        assert {name: a.read(name) for name in a.namelist()} == {name: b.read(name) for name in b.namelist()}
+        assert "Side_1.csv" in a.namelist() and "Side_2.csv" not in a.namelist()
+
+def cell_formats(data):
+    """Value and formatting of every cell of an xlsx table file, styles as their XML"""
+    ws = load_workbook(io.BytesIO(data)).active
+    return [
+        [
+            (cell.value, cell.number_format, *(tostring(style.to_tree()) for style in (cell.fill, cell.font, cell.border, cell.alignment)))
+            for cell in row
+        ]
+        for row in ws.iter_rows()
+    ]
+
+def test_streaming_xlsx_matches_full_load(tmp_path):
+    excel_path = str(tmp_path / "banded.xlsx")
+    make_ruleset_workbook(excel_path, sheets=3, rows=60, cols=10, blocks=2, header_bands=2, seed=5)
+    full = dict(iter_table_files(excel_path, "Sheet_1", "Sheet_3"))
+    streamed = dict(iter_table_files(excel_path, "Sheet_1", "Sheet_3", streaming=True))
+    assert list(streamed) == list(full) and len(full) >= 6
+    for name in full:
+        assert cell_formats(streamed[name]) == cell_formats(full[name]), name
+
+def test_style_cache_copies_each_style_once(tmp_path, monkeypatch):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Shared"
+    write_table(ws, 1, 1, ["Size", "A", "B", "C"], option_rows(200, 4, "S"))
+    body_font = Font(name="Arial", italic=True)
+    for row in ws.iter_rows(min_row=2, max_row=201):
+        for cell in row:
+            cell.font = body_font
+    excel_path = str(tmp_path / "shared.xlsx")
+    wb.save(excel_path)
+
+    copies = []
+    monkeypatch.setattr(extractTables, "copy_cell_format", lambda *cells: copies.append(cells) or copy_cell_format(*cells))
+    caches = []
+    [(name, table)] = list(iter_table_workbooks(excel_path, "Shared", "Shared", style_caches=caches))
+
+    # One copy for the header style, one for the body style, every other cell reuses them
+    assert len(copies) == 2
+    assert style_cache_stats(caches) == {"hits": 4 * 201 - 2, "misses": 2, "hit_rate": (4 * 201 - 2) / (4 * 201)}
+    cells = [cell for row in table.active.iter_rows() for cell in row]
+    assert len({tuple(cell._style) for cell in cells}) == 2
+    # The default font and fills, plus the body font and the header fill
+    assert len(table._fonts) == 2 and len(table._fills) == 3
+    assert table.active["B2"].font.italic and table.active["B1"].fill == HEADER_FILL
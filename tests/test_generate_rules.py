@@ -0,0 +1,81 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from benchmarks.synthetic import make_ruleset_workbook
+from tests.reference import reference_rule_files
+from tests.workbooks import make_edge_case_workbook
+
+@pytest.fixture(scope="module")
+def rules_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("rulesets")
+    make_ruleset_workbook(str(path / "plain.xlsx"), sheets=2, rows=120, cols=12, seed=1)
+    make_ruleset_workbook(str(path / "banded.xlsx"), sheets=2, rows=80, cols=15, blocks=2, header_bands=2, seed=2)
+    make_edge_case_workbook(str(path / "edge.xlsx"))
+    with open(path / "broken.xlsx", "wb") as f:
+        f.write(b"not a workbook")
+    return str(path)
+
+def rule_files(response):
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+@pytest.mark.parametrize("reader", ["openpyxl", "xml"])
+def test_rule_files_match_double_read_pipeline(rules_dir, reader):
+    client = TestClient(app)
+    response = client.get("/generate-rules", params={
+        "excel_files_path": rules_dir, "stream": "false", "cache": "false", "reader": reader,
+    })
+    expected = reference_rule_files(rules_dir)
+    assert set(expected) == {"plain_rules.txt", "banded_rules.txt", "edge_rules.txt"}
+    assert rule_files(response) == expected
+    assert response.headers["X-Files-Processed"] == "3"
+
+def test_pooled_run_matches_serial(rules_dir):
+    client = TestClient(app)
+    params = {"excel_files_path": rules_dir, "stream": "false", "cache": "false"}
+    serial = rule_files(client.get("/generate-rules", params={**params, "workers": 1}))
+    pooled = rule_files(client.get("/generate-rules", params={**params, "workers": 2}))
+    assert pooled == serial
+
+def test_uncached_run_does_not_hash_workbooks(rules_dir, monkeypatch):
+    def file_digest(source):
+        raise AssertionError("workbook hashed with the cache off")
+
+    monkeypatch.setattr("app.main.file_digest", file_digest)
+    client = TestClient(app)
+    response = client.get("/generate-rules", params={"excel_files_path": rules_dir, "stream": "false", "cache": "false"})
+    assert response.headers["X-Files-Processed"] == "3"
+
+@pytest.mark.parametrize("limit", [0, -3])
+def test_header_scan_limit_must_be_positive(rules_dir, limit):
+    response = TestClient(app).get("/generate-rules", params={"excel_files_path": rules_dir, "header_scan_limit": limit})
+    assert response.status_code == 422
+
+def test_full_zip_has_its_length_and_counts(rules_dir):
+    response = TestClient(app).get("/generate-rules", params={"excel_files_path": rules_dir, "cache": "false"})
+    assert int(response.headers["Content-Length"]) == len(response.content)
+    assert response.headers["X-Files-Processed"] == "3"
+    assert "Server-Timing" in response.headers
+
+def test_concurrent_requests_keep_their_own_output(tmp_path, monkeypatch):
+    # Each request has its own workbooks, nothing is written to a shared folder
+    monkeypatch.chdir(tmp_path)
+    dirs = []
+    for n in range(4):
+        path = tmp_path / f"input_{n}"
+        path.mkdir()
+        make_ruleset_workbook(str(path / f"book_{n}.xlsx"), sheets=1, rows=60, cols=8, seed=n)
+        dirs.append(path)
+    expected = [reference_rule_files(str(path)) for path in dirs]
+
+    def fetch(path):
+        return rule_files(TestClient(app).get("/generate-rules", params={"excel_files_path": str(path), "cache": "false"}))
+
+    with ThreadPoolExecutor(max_workers=len(dirs)) as pool:
+        assert list(pool.map(fetch, dirs * 2)) == expected * 2
+    assert sorted(os.listdir(tmp_path)) == [path.name for path in dirs]
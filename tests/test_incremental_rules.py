@@ -0,0 +1,85 @@
+"""Incremental runs parse only the sheets that changed and never cache a sheet that failed."""
+import pytest
+from openpyxl import load_workbook
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils import ruleRunner
+from app.utils.generateRules import decode_rules, encode_rules
+from app.utils.incrementalRules import incremental_rule_results
+from app.utils.resultCache import ResultCache
+from app.utils.ruleRunner import process_workbook
+from benchmarks.synthetic import make_ruleset_workbook
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Names of the sheets parsed, and the sheets made to fail"""
+    names = []
+    failing = set()
+    process_sheet = ruleRunner.process_sheet
+    def record(book, sheet_name, *args):
+        names.append(sheet_name)
+        if sheet_name in failing:
+            return None
+        return process_sheet(book, sheet_name, *args)
+    monkeypatch.setattr(ruleRunner, "process_sheet", record)
+    return names, failing
+
+def run(tmp_path, excel_path):
+    cache = ResultCache(root=str(tmp_path / "cache"))
+    [(_, data)] = incremental_rule_results([excel_path], cache, workers=1, manifest_file=str(tmp_path / "manifest.json"))
+    return data
+
+def test_only_changed_sheets_are_parsed(tmp_path, parsed):
+    names, _ = parsed
+    excel_path = str(tmp_path / "book.xlsx")
+    make_ruleset_workbook(excel_path, sheets=3, rows=40, cols=8, seed=1)
+
+    data = run(tmp_path, excel_path)
+    assert names == ["Sheet_1", "Sheet_2", "Sheet_3"]
+    assert data == encode_rules(process_workbook(excel_path))
+    names.clear()
+
+    # Unchanged: reused without parsing
+    run(tmp_path, excel_path)
+    assert names == []
+
+    # Edited: only that sheet is parsed again
+    wb = load_workbook(excel_path)
+    wb["Sheet_2"]["B5"] = "N" if wb["Sheet_2"]["B5"].value != "N" else "Y"
+    wb.save(excel_path)
+    edited = run(tmp_path, excel_path)
+    assert names == ["Sheet_2"]
+    assert edited == encode_rules(process_workbook(excel_path))
+    names.clear()
+
+    # Removed: its rules are dropped, the others come from the cache
+    wb = load_workbook(excel_path)
+    del wb["Sheet_3"]
+    wb.save(excel_path)
+    data = run(tmp_path, excel_path)
+    assert names == []
+    assert data == encode_rules(process_workbook(excel_path))
+    assert len(decode_rules(data)) < len(decode_rules(edited))
+
+def test_failed_sheets_are_not_cached(tmp_path, parsed):
+    names, failing = parsed
+    excel_path = str(tmp_path / "book.xlsx")
+    make_ruleset_workbook(excel_path, sheets=2, rows=40, cols=8, seed=2)
+
+    failing.add("Sheet_1")
+    data = run(tmp_path, excel_path)
+    assert names == ["Sheet_1", "Sheet_2"]
+    assert data == encode_rules(process_workbook(excel_path, ["Sheet_2"]))
+
+    # The failed sheet is parsed again, the other one comes from the cache
+    failing.clear()
+    names.clear()
+    data = run(tmp_path, excel_path)
+    assert names == ["Sheet_1"]
+    assert data == encode_rules(process_workbook(excel_path))
+
+def test_incremental_without_cache_parses_everything(tmp_path, capsys):
+    make_ruleset_workbook(str(tmp_path / "book.xlsx"), sheets=1, rows=40, cols=8, seed=3)
+    response = TestClient(app).get("/generate-rules", params={"excel_files_path": str(tmp_path), "incremental": "true", "cache": "false"})
+    assert response.status_code == 200
+    assert "Incremental mode needs the result cache" in capsys.readouterr().out
@@ -0,0 +1,88 @@
+"""Jobs are visible to every process sharing JOB_FOLDER and expire once finished or once their heartbeat stops."""
+import json
+import os
+import threading
+import time
+from app.utils.jobs import STATUS_NAME, JobManager
+
+def wait_until_finished(manager, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job is not None and job.finished_at:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+def test_job_is_served_by_another_manager(tmp_path):
+    def run(job):
+        job.report(files_total=1)
+        job.report(file="a.xlsx")
+        path = os.path.join(job.workspace, "result.zip")
+        with open(path, "wb") as f:
+            f.write(b"zip")
+        job.headers = {"X-Files-Processed": "1"}
+        return path
+
+    runner = JobManager(root=str(tmp_path), workers=1)
+    # Stands in for another server worker: same folder, its own queue and no jobs of its own
+    other = JobManager(root=str(tmp_path), workers=1)
+    job = runner.submit("generate-rules", run)
+
+    seen = wait_until_finished(other, job.id)
+    assert seen.status == "done"
+    assert seen.to_dict(other.ttl)["progress"]["files_done"] == 1
+    assert seen.headers == {"X-Files-Processed": "1"}
+    with open(seen.result_path, "rb") as f:
+        assert f.read() == b"zip"
+    assert other.get("0" * 32) is None
+    assert other.get("../outside") is None
+
+def test_sweep_expires_finished_jobs_by_finish_time(tmp_path):
+    manager = JobManager(root=str(tmp_path), workers=1, ttl=60)
+    job = manager.submit("extract", lambda job: None)
+    wait_until_finished(manager, job.id)
+    stale = tmp_path / ("f" * 32)
+    stale.mkdir()
+
+    manager.sweep()
+    assert os.path.isdir(job.workspace) and stale.is_dir()
+
+    # A fresh manager, as after a restart, sweeps what earlier processes left
+    JobManager(root=str(tmp_path), workers=1, ttl=0).sweep()
+    assert not os.path.exists(job.workspace)
+    old = time.time() - 120
+    os.utime(stale, (old, old))
+    JobManager(root=str(tmp_path), workers=1, ttl=60).sweep()
+    assert not stale.exists()
+
+def test_sweep_keeps_jobs_running_in_another_process(tmp_path):
+    release = threading.Event()
+    runner = JobManager(root=str(tmp_path), workers=1, ttl=1, heartbeat=0.05)
+    job = runner.submit("generate-rules", lambda job: release.wait(10) and None)
+    other = JobManager(root=str(tmp_path), workers=1, ttl=1, heartbeat=0.05)
+    try:
+        # Past the TTL since it started, with no progress saved meanwhile
+        time.sleep(1.5)
+        other.sweep()
+        assert other.get(job.id).status == "running"
+    finally:
+        release.set()
+    wait_until_finished(other, job.id)
+    time.sleep(1.1)
+    other.sweep()
+    assert not os.path.exists(job.workspace)
+
+def test_sweep_removes_jobs_whose_heartbeat_stopped(tmp_path):
+    # Left running by a process that died: the status file is no longer touched
+    workspace = tmp_path / ("a" * 32)
+    workspace.mkdir()
+    status = workspace / STATUS_NAME
+    status.write_text(json.dumps({"id": "a" * 32, "kind": "extract", "status": "running", "finished_at": None}))
+    manager = JobManager(root=str(tmp_path), workers=1, ttl=60, heartbeat=1)
+    manager.sweep()
+    assert workspace.is_dir()
+    old = time.time() - 120
+    os.utime(status, (old, old))
+    manager.sweep()
+    assert not workspace.exists()
@@ -0,0 +1,73 @@
+"""Counters and stage timings reach /metrics, including the ones recorded in pool workers."""
+import io
+import zipfile
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.generateRules import decode_rules
+from app.utils.metrics import REGISTRY, StageTimer, capture, count, replay, stage, timing
+from app.utils.ruleRunner import generate_sheet_rules_for_workbooks
+from benchmarks.synthetic import make_ruleset_workbook
+
+def counter(name, **labels):
+    return REGISTRY.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+def scrape(client):
+    """{metric line name with labels: value} of /metrics"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+def test_captured_events_are_recorded_on_replay():
+    before = counter("rules_emitted_total")
+    with capture() as events:
+        count("rules_emitted_total", 5)
+        with stage("rules", "a.xlsx", "Sheet_1"):
+            pass
+    assert counter("rules_emitted_total") == before
+    assert [event[:2] for event in events] == [("count", "rules_emitted_total"), ("stage", "rules")]
+
+    with timing(StageTimer()) as timer:
+        replay(events)
+    assert counter("rules_emitted_total") == before + 5
+    assert list(timer.stages) == ["rules"] and list(timer.sheets) == [("a.xlsx", "Sheet_1")]
+
+def test_pool_worker_metrics_reach_this_process(tmp_path):
+    paths = [str(tmp_path / f"{name}.xlsx") for name in ("a", "b")]
+    for seed, path in enumerate(paths):
+        make_ruleset_workbook(path, sheets=2, rows=30, cols=6, seed=seed)
+    sheets = counter("sheets_processed_total")
+    rules = counter("rules_emitted_total")
+
+    with timing(StageTimer()) as timer:
+        results = list(generate_sheet_rules_for_workbooks([(path, None) for path in paths], workers=2))
+    assert counter("sheets_processed_total") == sheets + 4
+    assert counter("rules_emitted_total") == rules + sum(len(r) for _, sheet_rules in results for _, r in sheet_rules)
+    assert {"open", "parse", "header", "clean", "rules"} <= set(timer.stages)
+    assert {sheet for _, sheet in timer.sheets} >= {"Sheet_1", "Sheet_2"}
+
+def test_metrics_count_a_request(tmp_path):
+    make_ruleset_workbook(str(tmp_path / "a.xlsx"), sheets=3, rows=30, cols=6, seed=1)
+    (tmp_path / "broken.xlsx").write_bytes(b"not a workbook")
+    client = TestClient(app)
+    before = scrape(client)
+
+    response = client.get("/generate-rules", params={"excel_files_path": str(tmp_path), "cache": "false", "workers": 2})
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        rules = len(decode_rules(archive.read("a_rules.txt")))
+    assert "parse;dur=" in response.headers["Server-Timing"]
+
+    after = scrape(client)
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+    assert delta("configurator_sheets_processed_total") == 3
+    assert delta("configurator_rules_emitted_total") == rules
+    assert delta('configurator_errors_total{stage="open"}') == 1
+    assert delta('configurator_stage_seconds_count{stage="parse"}') == 3
+    assert delta('configurator_stage_seconds_bucket{stage="parse",le="+Inf"}') == 3
@@ -0,0 +1,77 @@
+"""Every sheet reader gives the same grid as pandas' openpyxl reader."""
+import datetime
+from importlib.util import find_spec
+import pytest
+from openpyxl import Workbook
+from app.utils.sheetReaders import OpenpyxlReader, list_sheet_names, open_reader, resolve_reader
+from benchmarks.synthetic import make_ruleset_workbook
+from tests.workbooks import make_edge_case_workbook
+
+def make_typed_workbook(path):
+    """Strings, numbers, dates, booleans, gaps and ragged rows"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Typed"
+    ws.append(["Key", "Int", "Float", "Date", "Time", "Bool", "Text"])
+    ws.append(["K1", 1, 1.5, datetime.datetime(2024, 2, 29, 13, 30), datetime.time(8, 15), True, "  padded  "])
+    ws.append(["K2", -7, 1e-9, datetime.date(1999, 12, 31), None, False, ""])
+    ws.append(["K3", 10 ** 12, 2.0, None, None, None, "ünïcødé"])
+    ws.append([])
+    ws.append([None, None, "late"])
+    ws["J9"] = "far corner"
+    wb.create_sheet("Blank")
+    wb.save(path)
+
+@pytest.fixture(scope="module")
+def workbooks(tmp_path_factory):
+    path = tmp_path_factory.mktemp("readers")
+    paths = [str(path / name) for name in ("ruleset.xlsx", "edge.xlsx", "typed.xlsx")]
+    make_ruleset_workbook(paths[0], sheets=2, rows=50, cols=10, blocks=2, header_bands=2, seed=4)
+    make_edge_case_workbook(paths[1])
+    make_typed_workbook(paths[2])
+    return paths
+
+def grids(excel_path, reader):
+    with open_reader(excel_path, reader) as book:
+        return {sheet_name: book.read_grid(sheet_name) for sheet_name in book.sheet_names}
+
+@pytest.mark.parametrize("reader, module", [("xml", "openpyxl"), ("calamine", "python_calamine")])
+def test_read_grid_matches_openpyxl(workbooks, reader, module):
+    if find_spec(module) is None:
+        pytest.skip(f"{module} is not installed")
+    for excel_path in workbooks:
+        assert grids(excel_path, reader) == grids(excel_path, "openpyxl"), excel_path
+
+def test_xls_matches_xlsx(tmp_path):
+    for module in ("xlrd", "xlwt"):
+        if find_spec(module) is None:
+            pytest.skip(f"{module} is not installed")
+    import xlwt
+    rows = [["Key", "Int", "Float", "Text"], ["K1", 1, 1.5, "a"], ["K2", -7, 2.25, ""], [], ["K3", 10 ** 6, 0.5, "ünïcødé"]]
+    wb = Workbook()
+    book = xlwt.Workbook()
+    for title in ("First", "Second"):
+        ws = wb.create_sheet(title)
+        sheet = book.add_sheet(title)
+        for r, row in enumerate(rows):
+            ws.append(row)
+            for c, value in enumerate(row):
+                if value != "":
+                    sheet.write(r, c, value)
+    wb.remove(wb["Sheet"])
+    wb.save(tmp_path / "book.xlsx")
+    book.save(str(tmp_path / "book.xls"))
+
+    xls_path = str(tmp_path / "book.xls")
+    assert resolve_reader(xls_path, "openpyxl") in ("calamine", "xlrd")
+    assert grids(xls_path, "xlrd") == grids(str(tmp_path / "book.xlsx"), "openpyxl")
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_styled_rows_cover_every_sheet(workbooks, streaming):
+    excel_path = workbooks[2]
+    with OpenpyxlReader(excel_path, streaming) as book:
+        assert book.sheet_names == list_sheet_names(excel_path)
+        rows = [[cell.value for cell in row] for row in book.styled_rows("Typed")]
+    assert rows[0][:2] == ["Key", "Int"]
+    assert rows[8][9] == "far corner"
+    assert {len(row) for row in rows} == {10}
@@ -0,0 +1,90 @@
+import io
+import os
+import pickle
+import tempfile
+import zipfile
+from fastapi.testclient import TestClient
+from starlette.datastructures import UploadFile
+from app.main import app, workbook_rule_entries
+from app.utils.uploads import UploadSpool, UploadedWorkbook, WorkbookBuffer, source_size
+from benchmarks.synthetic import make_ruleset_workbook
+
+def workbook_bytes(tmp_path, name, seed):
+    path = tmp_path / name
+    make_ruleset_workbook(str(path), sheets=1, rows=60, cols=8, seed=seed)
+    return path.read_bytes()
+
+def test_held_upload_is_read_in_place(tmp_path):
+    data = workbook_bytes(tmp_path, "a.xlsx", 1)
+    # Past max_size, as the form parser spools a large part to disk
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024)
+    spooled.write(data)
+    spool = UploadSpool()
+    source = spool.hold(UploadFile(spooled, filename="dir/a.xlsx"))
+
+    assert isinstance(source, UploadedWorkbook) and source.name == "a.xlsx"
+    assert source_size(source) == len(data)
+    assert spool.in_memory == 0
+    expected = dict(workbook_rule_entries([str(tmp_path / "a.xlsx")], use_cache=False))
+    assert dict(workbook_rule_entries([source], use_cache=False)) == expected
+
+    # Pool workers get the bytes
+    copy = pickle.loads(pickle.dumps(source))
+    assert isinstance(copy, WorkbookBuffer) and copy.getvalue() == data and copy.name == "a.xlsx"
+
+    spool.close()
+    assert spooled.closed
+
+def test_expand_limits_the_running_total(tmp_path):
+    members = {f"{name}.xlsx": workbook_bytes(tmp_path, f"{name}.xlsx", seed) for seed, name in enumerate("abc")}
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as f:
+        for name, data in members.items():
+            f.writestr(name, data)
+    archive.seek(0)
+
+    # Each member fits on its own, all three don't
+    limit = sum(len(data) for data in members.values()) - 1
+    spool = UploadSpool(limit)
+    try:
+        sources = spool.expand(WorkbookBuffer(archive.getvalue(), "files.zip"))
+        assert [isinstance(source, WorkbookBuffer) for source in sources] == [True, True, False]
+        assert spool.in_memory <= limit
+        assert sources[2].endswith("c.xlsx")
+        with open(sources[2], "rb") as f:
+            assert f.read() == members["c.xlsx"]
+    finally:
+        spool.close()
+    assert not os.path.exists(sources[2])
+
+def rule_file_names(response):
+    assert response.status_code == 200, response.text
+    with zipfile.ZipFile(io.BytesIO(response.content)) as f:
+        return sorted(f.namelist())
+
+def test_multipart_files_with_the_same_name(tmp_path):
+    files = [("files", ("a.xlsx", workbook_bytes(tmp_path, f"{seed}.xlsx", seed))) for seed in (1, 2)]
+    response = TestClient(app).post("/generate-rules/upload", params={"cache": "false"}, files=files)
+    assert rule_file_names(response) == ["a_2_rules.txt", "a_rules.txt"]
+
+def test_multipart_spooling_follows_the_limit(tmp_path, monkeypatch):
+    data = workbook_bytes(tmp_path, "a.xlsx", 1)
+    rolled = []
+    hold = UploadSpool.hold
+    def record(spool, upload):
+        workbook = hold(spool, upload)
+        rolled.append(upload.file._rolled)
+        return workbook
+    monkeypatch.setattr(UploadSpool, "hold", record)
+    client = TestClient(app)
+    files = [("files", (name, data)) for name in ("a.xlsx", "b.xlsx")]
+
+    # The first file fits the limit, the second would not
+    monkeypatch.setattr("app.main.UploadSpool", lambda: UploadSpool(len(data) + 1024))
+    assert len(rule_file_names(client.post("/generate-rules/upload", params={"cache": "false"}, files=files))) == 2
+    assert rolled == [False, True]
+
+    rolled.clear()
+    monkeypatch.setattr("app.main.UploadSpool", lambda: UploadSpool(10 * len(data)))
+    response = client.post("/extract/upload", params={"start_sheet": "Sheet_1", "end_sheet": "Sheet_1", "cache": "false"}, files=files[:1])
+    assert response.status_code == 200 and rolled == [False]
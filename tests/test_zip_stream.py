@@ -0,0 +1,13 @@
+import zipfile
+from app.utils.zipStream import spool_zip
+
+def test_spooled_zip_spills_past_the_memory_cap():
+    entries = [(f"sheet_{i}.txt", bytes([i]) * 4096) for i in range(8)]
+    small, count = spool_zip(iter(entries), max_memory=1024)
+    large, _ = spool_zip(iter(entries), max_memory=1024 * 1024)
+    with small, large:
+        assert count == 8
+        # Past the cap the zip lives in a temp file, below it in memory
+        assert small._rolled and not large._rolled
+        with zipfile.ZipFile(small) as archive:
+            assert [(name, archive.read(name)) for name in archive.namelist()] == entries
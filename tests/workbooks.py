@@ -0,0 +1,34 @@
+"""Small workbooks with the awkward cases real rulesets have, for the tests"""
+from datetime import date, datetime, timedelta
+from openpyxl import Workbook
+
+def make_edge_case_workbook(path):
+    """Mixed types, blank and duplicate headers, NA strings, dates, long text and an empty sheet"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Mixed"
+    ws.append(["Ruleset", "rev 3"])
+    ws.append([])
+    ws.append(["Valve Size", "Opt-A", "Opt-A", None, "N/A", "Date", "Notes"])
+    for r in range(40):
+        ws.append([
+            f"V{r:03d}" if r % 7 else r,
+            "N" if r % 3 == 0 else "Y",
+            " n " if r % 4 == 0 else "y",
+            None if r % 2 else "N",
+            "NA" if r % 5 == 0 else "N",
+            date(2024, 1, 1) + timedelta(days=r),
+            "x" * 300 if r == 5 else f"note {r % 6}",
+        ])
+
+    ws = wb.create_sheet("Numbers")
+    ws.append(["Size", 1.5, 2, True, datetime(2024, 5, 1, 12, 30)])
+    for r in range(25):
+        ws.append([r * 0.25, "N" if r % 2 else "Y", r, r % 3 == 0, "N"])
+
+    wb.create_sheet("Empty")
+
+    ws = wb.create_sheet("Header Only")
+    ws.append(["Key", "Option"])
+    wb.save(path)
+    return path